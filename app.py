@@ -1,16 +1,26 @@
 # -*- coding: utf-8 -*-
+import time
+
+_import_start = time.perf_counter()
+
 import dash
 import dash_table
 import dash_core_components as dcc
 import dash_bootstrap_components as dbc
 import dash_html_components as html
-from dash.dependencies import Input, Output, State
+from dash.dependencies import Input, Output, State, ClientsideFunction
+
+from flask import jsonify
 
-from visualize_usau_module import ranking_data, spirit_correlation, \
-    COMP_DIVISIONS, get_divisions, get_regions, table_data
+from cache_utils import ResponseCache
+from dynasty_utils import LEADERBOARD_COLUMNS, PEAK_WINDOW
+from metrics_utils import METRICS
+from visualize_usau_module import COMP_DIVISIONS, DATA_VERSION, QUERY_CACHE, STARTUP_TIMES, get_divisions, \
+    get_regions, table_data, filter_view, subset_df, table_page, default_teams, dynasty_records, iter_filters
 
 from dash_constants import BACKGROUND_COLOR_DARK, BACKGROUND_COLOR_LIGHT, TEXT_SIZE, \
-    PLOT_BACKGROUND_COLOR, HEADER_2_SIZE, BACKGROUND_LIGHT_RGB, BACKGROUND_ALPHA, INITIAL_NUM_CHECKED
+    PLOT_BACKGROUND_COLOR, HEADER_2_SIZE, BACKGROUND_LIGHT_RGB, BACKGROUND_ALPHA, INITIAL_NUM_CHECKED, \
+    TABLE_PAGE_SIZE
 
 style = {'backgroundColor': BACKGROUND_COLOR_LIGHT, 'font-family': 'Arial'}
 
@@ -50,17 +60,36 @@ app = dash.Dash(__name__, external_stylesheets=external_stylesheets,
                 )
 app.title = TITLE
 server = app.server
+# callback latency, stage and payload histograms at /metrics, installed first to see responses as sent
+METRICS.init_app(server)
+# callbacks only depend on their inputs and the dataset, identical requests are answered from the cache
+RESPONSE_CACHE = ResponseCache(server, version=DATA_VERSION)
+# filter metrics are only labelled with filters of the dataset, clients can post any value and every label value
+# creates a series that is kept for the life of the worker
+KNOWN_FILTERS = frozenset(iter_filters())
+
+
+@server.route('/cache-stats')
+def cache_stats():
+    return jsonify(responses=RESPONSE_CACHE.stats(), queries=QUERY_CACHE.stats())
+
 
 TURF_LINE_IMAGE = app.get_asset_url('grass.jpg')
 LINKEDIN_IMAGE = app.get_asset_url('LinkedIn.png')
 GITHUB_IMAGE = app.get_asset_url('GitHub.png')
 
+STARTUP_TIMES['import modules'] = time.perf_counter() - _import_start - sum(STARTUP_TIMES.values())
+_stage_start = time.perf_counter()
+
 init_comp_division = COMP_DIVISIONS[0]
 init_division = get_divisions(init_comp_division)[1]['value']
 
+# initial graphs are drawn in the browser from the highlight-data store
 df = table_data(init_comp_division, init_division)
-fig_rankings = ranking_data(comp_division=init_comp_division, division=init_division, highlight_teams=df.Team.tolist())
-fig_spirit = spirit_correlation(comp_division=init_comp_division, division=init_division)
+init_page, init_page_count = table_page(init_comp_division, init_division)
+init_dynasties = dynasty_records(init_comp_division, init_division)
+STARTUP_TIMES['initial view'] = time.perf_counter() - _stage_start
+_stage_start = time.perf_counter()
 
 app.layout = html.Div(style=style, children=[
 
@@ -188,10 +217,19 @@ app.layout = html.Div(style=style, children=[
             children=[html.Div([dash_table.DataTable(
                 id='ranking_table',
                 columns=[{"name": i, "id": i} for i in df.columns],
-                data=df.to_dict('records'),
+                # only the visible page is sent, sorted and filtered on the server
+                data=init_page,
+                page_action='custom',
+                page_current=0,
+                page_size=TABLE_PAGE_SIZE,
+                page_count=init_page_count,
+                sort_action='custom',
+                sort_mode='single',
+                sort_by=[],
+                filter_action='custom',
+                filter_query='',
                 # style_as_list_view=True,
                 row_selectable="multi",
-                sort_action='native',
                 selected_rows=list(range(INITIAL_NUM_CHECKED)),
                 fixed_rows={'headers': True, 'data': 0},
                 style_header={'font-weight': 'bold',
@@ -236,7 +274,7 @@ app.layout = html.Div(style=style, children=[
                                                                'font-size': HEADER_2_SIZE}),
         dcc.Loading(
             id="loading-rankings",
-            children=[html.Div([dcc.Graph(id='rankings_graph', figure=fig_rankings)])],
+            children=[html.Div([dcc.Graph(id='rankings_graph')])],
             type="circle",
         ),
 
@@ -248,12 +286,63 @@ app.layout = html.Div(style=style, children=[
                 style={'textAlign': 'center', 'font-size': TEXT_SIZE}),
         dcc.Loading(
             id="loading-spirit",
-            children=[html.Div([dcc.Graph(id='spirit_graph', figure=fig_spirit)])],
+            children=[html.Div([dcc.Graph(id='spirit_graph')])],
             type="circle",
         ),
 
     ], style={'padding': 10}),
 
+    # dynasty leaderboard section
+    html.Div([
+        html.H2(children='DYNASTY LEADERBOARD', style={'textAlign': 'center', 'padding': 1,
+                                                       'font-size': HEADER_2_SIZE, 'letter-spacing': '1px'}),
+        html.H3(children=f'Streaks are consecutive nationals, peak is the best average placement over '
+                         f'{PEAK_WINDOW} consecutive nationals',
+                style={'textAlign': 'center', 'font-size': TEXT_SIZE}),
+        html.Div([], style={'padding': 30}),
+        dcc.Loading(
+            id="loading-dynasties",
+            children=[html.Div([dash_table.DataTable(
+                id='dynasty_table',
+                columns=[{"name": i, "id": i} for i in LEADERBOARD_COLUMNS],
+                data=init_dynasties,
+                page_action='native',
+                page_size=TABLE_PAGE_SIZE,
+                sort_action='native',
+                sort_mode='multi',
+                fixed_rows={'headers': True, 'data': 0},
+                style_header={'font-weight': 'bold',
+                              'font-size': TEXT_SIZE,
+                              'backgroundColor': BACKGROUND_COLOR_LIGHT},
+                style_table={
+                    'maxHeight': '500px',
+                    'overflowY': 'auto',
+                },
+                style_cell={'textAlign': 'center',
+                            'font-size': '20px',
+                            'textOverflow': 'ellipsis',
+                            'minWidth': '0px', 'maxWidth': '10px',
+                            'font_family': 'Arial'},
+                style_data_conditional=[
+                    {
+                        'if': {'column_id': 'Team'},
+                        'width': '18%',
+                        'textAlign': 'left'
+                    },
+                    {
+                        'if': {'row_index': 'odd'},
+                        'backgroundColor': 'white'
+                    },
+                    {
+                        'if': {'row_index': 'even'},
+                        'backgroundColor': PLOT_BACKGROUND_COLOR
+                    }
+                ]
+            )], style={'padding': 1})],
+            type="circle",
+        ),
+    ], style={'backgroundColor': PLOT_BACKGROUND_COLOR, 'padding': 60}),
+
     # Footer section
     html.Div([html.P(children=['©2019 by Micah Botkin-Levy.  ',
                                html.A([
@@ -279,14 +368,34 @@ app.layout = html.Div(style=style, children=[
                                ])],
              style={'textAlign': 'right', 'padding': 10, 'backgroundColor': BACKGROUND_COLOR_DARK, 'color': 'white',
                     'font-size': '16px'}),
-    # Hidden div inside the app that stores the intermediate value
-    html.Div(id='table-length-value', children=len(df), style={'display': 'none'})
+    # selected teams of every table page
+    dcc.Store(id='selected-teams', data=df.Team[:INITIAL_NUM_CHECKED].tolist()),
+    # data for the current filters used by the browser to redraw graphs when the selected teams change
+    dcc.Store(id='highlight-data', data=filter_view(init_comp_division, init_division)[1])
 ])
+STARTUP_TIMES['layout'] = time.perf_counter() - _stage_start
+
+
+def startup_report() -> str:
+    """ Get time spent on each startup stage
+
+    Returns:
+        str
+    """
+    return 'startup: ' + ', '.join(f'{stage} {seconds * 1000:.0f}ms' for stage, seconds in STARTUP_TIMES.items()) + \
+           f', total {sum(STARTUP_TIMES.values()) * 1000:.0f}ms'
+
+
+def filter_labels(comp_division, division, region) -> dict:
+    if (comp_division, division, region) not in KNOWN_FILTERS:
+        comp_division = division = region = 'other'
+    return {'comp_division': comp_division, 'division': division, 'region': region}
 
 
 @app.callback([Output('division_dropdown', 'options'),
                Output('division_dropdown', 'value')],
               [Input('comp_division_dropdown', 'value')])
+@METRICS.callback
 def update_division_dropdown(comp_division):
     div_options = get_divisions(comp_division)
     if 'D-I Women\'s' in [f['value'] for f in div_options]:
@@ -300,70 +409,121 @@ def update_division_dropdown(comp_division):
 @app.callback([Output('region_dropdown', 'options'),
                Output('region_dropdown', 'value')],
               [Input('comp_division_dropdown', 'value'), Input('division_dropdown', 'value')])
+@METRICS.callback
 def update_region_dropdown(comp_division, division):
     region_options = get_regions(comp_division, division)
     return region_options, region_options[0]['value']
 
 
-@app.callback([Output('ranking_table', 'data'),
-               Output('select-all-button', 'n_clicks'),
-               Output('table-length-value', 'children')],
+@app.callback([Output('select-all-button', 'n_clicks'),
+               Output('highlight-data', 'data')],
               [Input('comp_division_dropdown', 'value'),
                Input('division_dropdown', 'value'),
                Input('region_dropdown', 'value')])
-def update_table(comp_division, division, region):
-    table_df = table_data(comp_division, division, region)
-    return table_df.to_dict('records'), 0, len(table_df)
-
-
-@app.callback(
-    Output('ranking_table', "selected_rows"),
-    [Input('select-all-button', 'n_clicks'),
-     Input('table-length-value', "children")]
-)
-def select_all(n_clicks, data_length):
-    if data_length == 0:
-        return []
-    if n_clicks is None:
-        n_clicks = 0
-    if n_clicks == 0:
-        return list(range(min(INITIAL_NUM_CHECKED, data_length)))
-    elif n_clicks % 2 == 0:
-        return []
-    else:
-        return list(range(data_length))
+@METRICS.callback
+def update_filter_outputs(comp_division, division, region):
+    # graph data comes prebuilt or from one shared subset and per team summary, the table is paged separately
+    labels = filter_labels(comp_division, division, region)
+    METRICS.annotate(**labels)
+    records, highlight = filter_view(comp_division, division, region)
+    METRICS.set_gauge('filter_rows', len(subset_df(comp_division, division, region)), **labels)
+    METRICS.set_gauge('filter_teams', len(records), **labels)
+    return 0, highlight
 
 
-@app.callback(Output('rankings_graph', 'figure'),
+@app.callback(Output('ranking_table', 'page_current'),
               [Input('comp_division_dropdown', 'value'),
                Input('division_dropdown', 'value'),
                Input('region_dropdown', 'value'),
-               Input('ranking_table', 'derived_virtual_selected_rows')],
-              [State('ranking_table', 'derived_virtual_data')])
-def update_ranking_figure(comp_division, division, region, rows, data):
-    if (not data) or (not rows):
-        teams = []
-    else:
-        teams = [t['Team'] for i, t in enumerate(data) if i in rows]
-    new_ranking = ranking_data(comp_division, division, region, teams)
-    return new_ranking
+               Input('ranking_table', 'sort_by'),
+               Input('ranking_table', 'filter_query')])
+@METRICS.callback
+def reset_table_page(comp_division, division, region, sort_by, filter_query):
+    # back to the first page like native paging, the rows of the current page may no longer exist
+    return 0
+
+
+def get_sort(sort_by):
+    if not sort_by:
+        return None, True
+    return sort_by[0]['column_id'], sort_by[0]['direction'] == 'asc'
 
 
-@app.callback(
+@app.callback([Output('ranking_table', 'data'),
+               Output('ranking_table', 'page_count'),
+               Output('ranking_table', 'selected_rows')],
+              [Input('select-all-button', 'n_clicks'),
+               Input('ranking_table', 'page_current'),
+               Input('ranking_table', 'page_size'),
+               Input('ranking_table', 'sort_by'),
+               Input('ranking_table', 'filter_query')],
+              [State('comp_division_dropdown', 'value'),
+               State('division_dropdown', 'value'),
+               State('region_dropdown', 'value'),
+               State('selected-teams', 'data')])
+@METRICS.callback
+def update_table_page(n_clicks, page_current, page_size, sort_by, filter_query, comp_division, division, region,
+                      selected_teams):
+    # new filters reset n_clicks, then the selection is the same one update_selected_teams stores
+    triggered = [p['prop_id'] for p in dash.callback_context.triggered]
+    if 'select-all-button.n_clicks' in triggered:
+        selected_teams = default_teams(comp_division, division, region, n_clicks)
+    # reset_table_page moves the table to the first page at the same time
+    if 'ranking_table.sort_by' in triggered or 'ranking_table.filter_query' in triggered:
+        page_current = 0
+    sort_column, ascending = get_sort(sort_by)
+    records, page_count = table_page(comp_division, division, region, page_current or 0, page_size, sort_column,
+                                     ascending, filter_query)
+    selected = set(selected_teams or [])
+    return records, page_count, [i for i, row in enumerate(records) if row['Team'] in selected]
+
+
+@app.callback(Output('selected-teams', 'data'),
+              [Input('select-all-button', 'n_clicks'),
+               Input('ranking_table', 'selected_rows')],
+              [State('comp_division_dropdown', 'value'),
+               State('division_dropdown', 'value'),
+               State('region_dropdown', 'value'),
+               State('ranking_table', 'data'),
+               State('selected-teams', 'data')])
+@METRICS.callback
+def update_selected_teams(n_clicks, selected_rows, comp_division, division, region, page, selected_teams):
+    if 'select-all-button.n_clicks' in [p['prop_id'] for p in dash.callback_context.triggered]:
+        return default_teams(comp_division, division, region, n_clicks)
+    # teams on other pages stay selected
+    page_teams = [row['Team'] for row in page or []]
+    selected_on_page = {page_teams[i] for i in selected_rows or [] if i < len(page_teams)}
+    return [team for team in selected_teams or [] if team not in page_teams] + \
+        [team for team in page_teams if team in selected_on_page]
+
+
+@app.callback([Output('dynasty_table', 'data'),
+               Output('dynasty_table', 'page_current')],
+              [Input('comp_division_dropdown', 'value'),
+               Input('division_dropdown', 'value'),
+               Input('region_dropdown', 'value')])
+@METRICS.callback
+def update_dynasty_table(comp_division, division, region):
+    # metrics are computed for every division at load time, the region only picks the teams
+    return dynasty_records(comp_division, division, region), 0
+
+
+# highlighting selected teams only happens in the browser, see assets/highlight.js
+app.clientside_callback(
+    ClientsideFunction(namespace='highlight', function_name='ranking_figure'),
+    Output('rankings_graph', 'figure'),
+    [Input('highlight-data', 'data'),
+     Input('selected-teams', 'data')])
+
+
+app.clientside_callback(
+    ClientsideFunction(namespace='highlight', function_name='spirit_figure'),
     Output('spirit_graph', 'figure'),
-    [Input('comp_division_dropdown', 'value'),
-     Input('division_dropdown', 'value'),
-     Input('region_dropdown', 'value'),
-     Input('ranking_table', 'derived_virtual_selected_rows')],
-    [State('ranking_table', 'derived_virtual_data')])
-def update_spirit_figure(comp_division, division, region, rows, data):
-    if (not data) or (not rows):
-        teams = []
-    else:
-        teams = [t['Team'] for i, t in enumerate(data) if i in rows]
-    new_spirit = spirit_correlation(comp_division, division, region, teams)
-    return new_spirit
+    [Input('highlight-data', 'data'),
+     Input('selected-teams', 'data')])
+
 
+print(startup_report())
 
 if __name__ == '__main__':
     # app.run_server(debug=True)
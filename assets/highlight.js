@@ -0,0 +1,130 @@
+// Redraw the ranking and spirit graphs in the browser when the selected teams (of every table page) change.
+// Mirrors visualize_usau_module.ranking_data(..., compact=True) and spirit_correlation using the data
+// from visualize_usau_module.highlight_data stored in the 'highlight-data' dcc.Store.
+
+// traces of the last drawn figures, reused when unchanged so Plotly.react only redraws traces that changed
+const previousTraces = {store: null, ranking: new Map(), spirit: new Map()};
+
+function reuseTrace(kind, store, key, trace) {
+    if (previousTraces.store !== store) {
+        previousTraces.store = store;
+        previousTraces.ranking.clear();
+        previousTraces.spirit.clear();
+    }
+    const previous = previousTraces[kind].get(key);
+    if (previous && JSON.stringify(previous) === JSON.stringify(trace)) {
+        return previous;
+    }
+    previousTraces[kind].set(key, trace);
+    return trace;
+}
+
+function selectedTeams(teams) {
+    return new Set(teams || []);
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    highlight: {
+        ranking_figure: function (store, teams) {
+            if (!store) {
+                return window.dash_clientside.no_update;
+            }
+            if (store.ranking_blank) {
+                return store.ranking_blank;
+            }
+            const selected = selectedTeams(teams);
+            const type = selected.size > store.webgl_min_teams ? 'scattergl' : 'scatter';
+            const years = store.years;
+            const traces = [];
+
+            // all teams that are not highlighted in one faded trace, gaps between teams and missing years
+            const fadedX = [];
+            const fadedY = [];
+            store.teams.forEach((team, t) => {
+                if (selected.has(team)) {
+                    return;
+                }
+                let previous = null;
+                store.standings[t].forEach((standing, i) => {
+                    if (standing === null) {
+                        return;
+                    }
+                    if (fadedX.length && previous !== i - 1) {
+                        fadedX.push(null);
+                        fadedY.push(null);
+                    }
+                    fadedX.push(years[i]);
+                    fadedY.push(standing);
+                    previous = i;
+                });
+            });
+            if (fadedX.length) {
+                traces.push(reuseTrace('ranking', store, 'faded', {
+                    type: type, x: fadedX, y: fadedY, hoverinfo: 'skip', hovertemplate: '',
+                    mode: 'lines+markers', connectgaps: false, opacity: 0.05, line: {shape: 'linear'},
+                    marker: {size: 18}, showlegend: false, name: 'Other teams'
+                }));
+            }
+
+            // highlighted teams with teams at the same place/year in the hover info
+            store.teams.forEach((team, t) => {
+                if (!selected.has(team)) {
+                    return;
+                }
+                const standings = store.standings[t];
+                const customdata = standings.map((standing, i) => {
+                    if (standing === null) {
+                        return null;
+                    }
+                    return store.overlap_teams[years[i] + '-' + standing]
+                        .filter(other => selected.has(other))
+                        .map(other => '<b>Team: ' + other + '</b>')
+                        .join('<br>');
+                });
+                traces.push(reuseTrace('ranking', store, team, {
+                    type: type, x: years, y: standings, hoverinfo: 'skip', customdata: customdata,
+                    hovertemplate: '%{customdata}<br>Year: %{x}<br>Placement: %{y}<extra></extra>',
+                    mode: 'lines+markers', connectgaps: false, opacity: 1, line: {shape: 'linear'},
+                    marker: {size: 18}, showlegend: false, name: team
+                }));
+            });
+            return {data: traces, layout: store.ranking_layout};
+        },
+
+        spirit_figure: function (store, teams) {
+            if (!store) {
+                return window.dash_clientside.no_update;
+            }
+            if (store.spirit_blank) {
+                return store.spirit_blank;
+            }
+            const selected = selectedTeams(teams);
+            const highlighted = [];
+            const faded = [];
+            store.spirit_teams.forEach((team, t) => {
+                (selected.has(team) ? highlighted : faded).push(t);
+            });
+
+            const traces = [];
+            if (highlighted.length) {
+                traces.push(reuseTrace('spirit', store, 'highlighted', {
+                    type: 'scatter', mode: 'markers', hoverinfo: 'text',
+                    x: highlighted.map(t => store.spirit_x[t]),
+                    y: highlighted.map(t => store.spirit_y[t]),
+                    hovertext: highlighted.map(t => store.spirit_hovertext[t]),
+                    hoverlabel: {font: {color: 'white'}},
+                    marker: {size: highlighted.map(t => store.spirit_count[t] * 1.5 + 10), color: store.marker_color}
+                }));
+            }
+            if (faded.length) {
+                traces.push(reuseTrace('spirit', store, 'faded', {
+                    type: 'scatter', mode: 'markers', hoverinfo: 'text', opacity: 0.1,
+                    x: faded.map(t => store.spirit_x[t]),
+                    y: faded.map(t => store.spirit_y[t]),
+                    marker: {size: faded.map(t => store.spirit_count[t] + 6), color: store.marker_color}
+                }));
+            }
+            return {data: traces, layout: store.spirit_layout};
+        }
+    }
+});
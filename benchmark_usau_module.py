@@ -0,0 +1,211 @@
+import argparse
+import gc
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import visualize_usau_module as vis
+from dash_constants import INITIAL_NUM_CHECKED
+from data_utils import DATA_DTYPES, DATA_PATH, compact_dataset, load_dataset
+from scrape_utils import clean_data, correct_regions, load_cleaning_rules
+
+RESULTS_PATH = './benchmark_results.json'
+SCALES = [1, 10, 100, 1000]
+REPEATS = 7
+# subset used by the per filter queries, the largest club division
+BENCHMARK_FILTERS = ('Club', 'MENS', 'all')
+
+
+def make_synthetic_dataset(df: pd.DataFrame, scale: int, seed: int = 0) -> pd.DataFrame:
+    """ Scale dataset up by adding copies of every team, keeping the real columns, compact types and years
+
+    Copy i of a team is named '<team> <i>', standings are shifted randomly so copies do not all tie and spirit scores
+    get some noise.
+
+    Args:
+        df (pd.DataFrame): real results
+        scale (int): number of copies
+        seed (int): random seed
+
+    Returns:
+        pd.DataFrame
+    """
+    if scale == 1:
+        return df.copy()
+    df = df.astype(DATA_DTYPES)
+    rng = np.random.default_rng(seed)
+    copies = np.repeat(np.arange(scale), len(df))
+    synthetic = pd.concat([df] * scale, ignore_index=True)
+    synthetic['Team'] = np.where(copies == 0, synthetic.Team, synthetic.Team + ' ' + copies.astype(str))
+    standing = synthetic.Standing + rng.integers(0, scale, len(synthetic)) * (copies > 0)
+    synthetic['Standing'] = standing
+    noise = rng.normal(0, 0.5, len(synthetic)) * (copies > 0)
+    synthetic['SpiritScores'] = (synthetic.SpiritScores + noise).clip(0, 20)
+    return compact_dataset(synthetic.astype(DATA_DTYPES))
+
+
+def make_raw_page(df: pd.DataFrame) -> pd.DataFrame:
+    """ Turn results back into the string table clean_data gets from an archive page
+
+    Args:
+        df (pd.DataFrame): results
+
+    Returns:
+        pd.DataFrame
+    """
+    return pd.DataFrame({'Standing': df.Standing.astype(str),
+                         'School': df.Team.astype(str) + '*',
+                         'Region': df.Region.astype(str),
+                         'division': df.division.astype(str),
+                         'Spirit Scores': df.SpiritScores.map('{:.2f}'.format)})
+
+
+def measure(func, repeats: int = REPEATS, setup=None) -> dict:
+    """ Time a function with the garbage collector disabled and measure its peak traced memory in an extra run
+
+    Args:
+        func: function without arguments
+        repeats (int): number of timed runs after one warm up run
+        setup: function run before every run, not timed
+
+    Returns:
+        dict: timings in seconds and peak memory in bytes
+    """
+    times = []
+    for i in range(repeats + 1):
+        if setup is not None:
+            setup()
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+        if i > 0:
+            times.append(elapsed)
+
+    if setup is not None:
+        setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'min': min(times),
+            'median': statistics.median(times),
+            'stdev': statistics.stdev(times) if len(times) > 1 else 0.0,
+            'repeats': repeats,
+            'peak_memory': peak_memory}
+
+
+def benchmark_dataset(df: pd.DataFrame, repeats: int = REPEATS) -> dict:
+    """ Benchmark the scrape and visualization hot paths on a dataset
+
+    Visualization queries are timed uncached, the query cache is cleared before every run.
+
+    Args:
+        df (pd.DataFrame): results dataset
+        repeats (int): number of timed runs
+
+    Returns:
+        dict: benchmark name -> measurements
+    """
+    rules = load_cleaning_rules()
+    raw_page = make_raw_page(df)
+    results = {'clean_data': measure(lambda: clean_data(raw_page, 'college', 2019, rules), repeats),
+               'correct_regions': measure(lambda: correct_regions(df), repeats)}
+
+    vis.set_dataset(df)
+    comp_division, division, region = BENCHMARK_FILTERS
+    highlight_teams = vis.table_data(comp_division, division, region).Team[:INITIAL_NUM_CHECKED].tolist()
+    queries = {'subset_df': lambda: vis.subset_df(comp_division, division, region),
+               'table_data': lambda: vis.table_data(comp_division, division, region),
+               'ranking_data': lambda: vis.ranking_data(comp_division, division, region, highlight_teams,
+                                                        compact=True),
+               'spirit_correlation': lambda: vis.spirit_correlation(comp_division, division, region,
+                                                                    highlight_teams),
+               'get_regions': lambda: vis.get_regions(comp_division, division),
+               'dynasty_records': lambda: vis.dynasty_records(comp_division, division, region),
+               'build_dynasties': vis.build_dynasties}
+    for name, query in queries.items():
+        results[name] = measure(query, repeats, setup=vis.QUERY_CACHE.clear)
+
+    # appending the latest season to a dataset without it, dynasty metrics are updated incrementally
+    last_year = df.year.max()
+    previous, season = df[df.year < last_year], df[df.year == last_year]
+    results['append_season'] = measure(lambda: vis.append_season(season), repeats,
+                                       setup=lambda: vis.set_dataset(previous))
+    vis.set_dataset(df)
+    return results
+
+
+def get_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def compare_results(results: dict, baseline: dict):
+    """ Print median time and peak memory ratios of results to a baseline results file
+
+    Args:
+        results (dict): benchmark results
+        baseline (dict): benchmark results to compare to
+    """
+    for scale, benchmarks in results['scales'].items():
+        for name, result in benchmarks.items():
+            base = baseline['scales'].get(scale, {}).get(name)
+            if base is None:
+                continue
+            time_ratio = result['median'] / base['median']
+            memory_ratio = result['peak_memory'] / base['peak_memory'] if base['peak_memory'] else float('nan')
+            flag = ' <-- slower' if time_ratio > 1.1 else ''
+            print(f'{scale:>5}x {name:<20} time {time_ratio:6.2f}x  memory {memory_ratio:6.2f}x{flag}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the scrape and visualization hot paths.')
+    parser.add_argument('--scales', type=int, nargs='+', default=SCALES,
+                        help='dataset scales to benchmark, 1 is the shipped dataset')
+    parser.add_argument('--repeats', type=int, default=REPEATS, help='timed runs per benchmark')
+    parser.add_argument('--output', default=RESULTS_PATH, help='results json path')
+    parser.add_argument('--compare', help='results json of another commit to compare to')
+    args = parser.parse_args()
+
+    real_df = load_dataset(DATA_PATH)
+    results = {'commit': get_commit(),
+               'python': platform.python_version(),
+               'pandas': pd.__version__,
+               'numpy': np.__version__,
+               'scales': {}}
+    for scale in args.scales:
+        df = make_synthetic_dataset(real_df, scale)
+        print(f'{scale}x: {len(df)} rows')
+        results['scales'][str(scale)] = benchmark_dataset(df, args.repeats)
+        for name, result in results['scales'][str(scale)].items():
+            print(f'  {name:<20} {result["median"] * 1000:10.2f}ms  '
+                  f'(min {result["min"] * 1000:.2f}ms, peak {result["peak_memory"] / 2 ** 20:.1f}MiB)')
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'Saved results to {args.output}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare_results(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,262 @@
+import functools
+import gzip
+import hashlib
+import inspect
+import threading
+from collections import OrderedDict
+
+from flask import Response, g, request
+
+# number of query results kept per worker
+QUERY_CACHE_SIZE = 512
+# number of callback responses kept per worker
+RESPONSE_CACHE_SIZE = 256
+# responses smaller than this are sent uncompressed
+MIN_COMPRESS_SIZE = 1024
+
+
+class QueryCache:
+    """ Size bounded LRU cache for dashboard queries with hit/miss counters
+
+    Entries are keyed by the dataset version so results from an older dataset are never returned. An optional shared
+    backend (any object with cachelib style get(key) -> value or None and set(key, value) methods, e.g. a redis
+    cache) is checked on a local miss so workers can share results.
+
+    Args:
+        maxsize (int): max number of local entries
+        version (str): dataset version
+        backend: optional shared cache
+    """
+
+    def __init__(self, maxsize: int = QUERY_CACHE_SIZE, version: str = '', backend=None):
+        self.maxsize = maxsize
+        self.version = version
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.backend_hits = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def set_version(self, version: str):
+        """ Switch to a new dataset version, dropping all local entries
+
+        Args:
+            version (str): dataset version
+        """
+        with self._lock:
+            self.version = version
+            self._entries.clear()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.backend_hits = 0
+
+    def stats(self) -> dict:
+        """ Get cache counters
+
+        Returns:
+            dict
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'version': self.version,
+                    'size': len(self._entries),
+                    'maxsize': self.maxsize,
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'backend_hits': self.backend_hits,
+                    'hit_ratio': self.hits / lookups if lookups else 0.0}
+
+    def _backend_key(self, key: tuple) -> str:
+        return f'{self.version}:{key!r}'
+
+    def get(self, key):
+        """ Get cached value for key, counting the hit or miss
+
+        Args:
+            key: hashable key
+
+        Returns:
+            cached value or None
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value, version: str = None):
+        """ Store value for key, evicting the least recently used entries
+
+        Args:
+            key: hashable key
+            value: value to store
+            version (str): dataset version the value was computed with, skipped if no longer current
+        """
+        with self._lock:
+            if version is not None and version != self.version:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key: tuple, compute):
+        """ Get cached value for key or compute, store and return it
+
+        Args:
+            key (tuple): hashable query key
+            compute: function without arguments computing the value
+
+        Returns:
+            cached or computed value
+        """
+        version = self.version
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        value = None
+        if self.backend is not None:
+            value = self.backend.get(self._backend_key(key))
+            if value is not None:
+                with self._lock:
+                    self.backend_hits += 1
+        if value is None:
+            value = compute()
+            if self.backend is not None:
+                self.backend.set(self._backend_key(key), value)
+
+        self.set(key, value, version=version)
+        return value
+
+
+def _freeze(value):
+    """ Make argument hashable, lists of teams are compared as sets """
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return tuple(sorted(set(value)))
+    return value
+
+
+def memoize(cache: QueryCache):
+    """ Cache results of a pure function of its arguments in cache
+
+    Returned values are shared between callers and must not be modified in place.
+
+    Args:
+        cache (QueryCache): cache to store results in
+
+    Returns:
+        decorator
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (func.__name__,) + tuple(_freeze(v) for v in bound.arguments.values())
+            return cache.get_or_compute(key, lambda: func(*args, **kwargs))
+
+        wrapper.uncached = func
+        return wrapper
+    return decorator
+
+
+class ResponseCache:
+    """ Cache of serialized Dash callback responses on a Flask server
+
+    Callback responses are keyed by a hash of the dataset version and the request body (callback id, inputs and
+    state), which is sent as ETag so clients and proxies can revalidate with If-None-Match. Large responses are
+    stored gzip compressed and sent compressed to clients accepting it. Only valid for callbacks which are pure
+    functions of their inputs and the dataset.
+
+    Args:
+        server (flask.Flask): server of the Dash app
+        version (str): dataset version
+        maxsize (int): max number of cached responses
+        path_suffix (str): path of the cached endpoint
+        min_compress_size (int): min size in bytes of compressed responses
+    """
+
+    def __init__(self, server, version: str = '', maxsize: int = RESPONSE_CACHE_SIZE,
+                 path_suffix: str = '_dash-update-component', min_compress_size: int = MIN_COMPRESS_SIZE):
+        self.cache = QueryCache(maxsize, version)
+        self.path_suffix = path_suffix
+        self.min_compress_size = min_compress_size
+        self.not_modified = 0
+        self.bytes_saved = 0
+        self._lock = threading.Lock()
+        server.before_request(self._before_request)
+        server.after_request(self._after_request)
+
+    def set_version(self, version: str):
+        self.cache.set_version(version)
+
+    def stats(self) -> dict:
+        """ Get cache counters, bytes saved counts uncompressed bytes of cached responses and compression savings
+
+        Returns:
+            dict
+        """
+        stats = self.cache.stats()
+        with self._lock:
+            stats.update(not_modified=self.not_modified, bytes_saved=self.bytes_saved)
+        return stats
+
+    def _count_saved(self, num_bytes: int):
+        with self._lock:
+            self.bytes_saved += num_bytes
+
+    def _etag(self) -> str:
+        return hashlib.sha1(self.cache.version.encode() + b'\0' + request.get_data()).hexdigest()
+
+    def _make_response(self, etag: str, entry: dict) -> Response:
+        body, compressed = entry['body'], entry['compressed']
+        response = Response(mimetype=entry['mimetype'])
+        if compressed and 'gzip' in request.accept_encodings:
+            response.headers['Content-Encoding'] = 'gzip'
+            self._count_saved(entry['size'] - len(body))
+        elif compressed:
+            body = gzip.decompress(body)
+        response.set_data(body)
+        response.set_etag(etag)
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
+
+    def _before_request(self):
+        if request.method != 'POST' or not request.path.endswith(self.path_suffix):
+            return None
+        etag = self._etag()
+        g.response_cache_etag = etag
+        entry = self.cache.get(etag)
+        if entry is None:
+            return None
+        g.response_cache_hit = True
+        self._count_saved(entry['size'])
+        if request.if_none_match.contains(etag):
+            with self._lock:
+                self.not_modified += 1
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+        return self._make_response(etag, entry)
+
+    def _after_request(self, response: Response) -> Response:
+        etag = g.pop('response_cache_etag', None)
+        if etag is None or g.pop('response_cache_hit', False) or response.status_code != 200 \
+                or response.direct_passthrough:
+            return response
+        body = response.get_data()
+        compressed = len(body) >= self.min_compress_size
+        entry = {'body': gzip.compress(body) if compressed else body,
+                 'compressed': compressed,
+                 'mimetype': response.mimetype,
+                 'size': len(body)}
+        self.cache.set(etag, entry)
+        return self._make_response(etag, entry)
@@ -16,3 +16,9 @@ AXIS_TITLE_SIZE = 26
 TICK_SIZE = 20
 
 INITIAL_NUM_CHECKED = 6
+
+# ranking graph switches to WebGL rendering above this many highlighted teams
+WEBGL_MIN_TEAMS = 40
+
+# rows per page of the summary table, pages are sorted, filtered and sliced on the server
+TABLE_PAGE_SIZE = 25
@@ -0,0 +1,294 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+
+DATA_PATH = './data/national_data.csv'
+
+# explicit column types of the results dataset
+DATA_DTYPES = {'Standing': 'int16',
+               'Team': 'object',
+               'Region': 'object',
+               'division': 'object',
+               'year': 'int16',
+               'comp_division': 'object',
+               'SpiritScores': 'float64'}
+
+# string columns are dictionary encoded when loaded, filters and groupbys then compare small integer codes
+CATEGORICAL_COLUMNS = ['Team', 'Region', 'division', 'comp_division']
+
+SQLITE_COLUMN_TYPES = {'Standing': 'INTEGER NOT NULL',
+                       'Team': 'TEXT NOT NULL',
+                       'Region': 'TEXT NOT NULL',
+                       'division': 'TEXT NOT NULL',
+                       'year': 'INTEGER NOT NULL',
+                       'comp_division': 'TEXT NOT NULL',
+                       'SpiritScores': 'REAL'}
+
+# every dashboard filter is a prefix of the first index, team histories use the second
+SQLITE_INDEXES = {'results_filters': ['comp_division', 'division', 'Region', 'Team', 'year'],
+                  'results_teams': ['comp_division', 'division', 'Team', 'year']}
+
+
+def dataset_version(df: pd.DataFrame) -> str:
+    """ Get a content hash identifying a dataset
+
+    Args:
+        df (pd.DataFrame): all results
+
+    Returns:
+        str
+    """
+    return format(int(pd.util.hash_pandas_object(df, index=False).sum()), 'x')
+
+
+@contextmanager
+def atomic_path(path: str):
+    """ Write a file under a temporary name next to path and move it in place once it is complete, so readers and
+    other processes never see a partial file
+
+    Args:
+        path (str): final file path
+
+    Yields:
+        str: temporary path to write to, removed if writing fails
+    """
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def read_results_csv(path: str) -> pd.DataFrame:
+    """ Read a results csv written by the pipeline without turning team names like 'NA' into NaN
+
+    Args:
+        path (str): csv path
+
+    Returns:
+        pd.DataFrame
+    """
+    if os.path.getsize(path) == 0:
+        return pd.DataFrame()
+    return pd.read_csv(path, keep_default_na=False, na_values=[''])
+
+
+def compact_dataset(df: pd.DataFrame, copy: bool = True) -> pd.DataFrame:
+    """ Convert the string columns of a dataset to categoricals, columns that already are categorical are kept
+
+    Args:
+        df (pd.DataFrame): results dataset
+        copy (bool): copy the columns that are not converted, False shares them with df
+
+    Returns:
+        pd.DataFrame
+    """
+    strings = {column: 'category' for column in CATEGORICAL_COLUMNS if df[column].dtype.name != 'category'}
+    if not strings and not copy:
+        return df
+    return df.astype(strings, copy=copy)
+
+
+def get_arrow_path(csv_path: str) -> str:
+    """ Get the path of the columnar (Arrow IPC/Feather) copy of a csv dataset
+
+    Args:
+        csv_path (str): csv dataset path
+
+    Returns:
+        str
+    """
+    return os.path.splitext(csv_path)[0] + '.feather'
+
+
+def write_arrow_dataset(df: pd.DataFrame, csv_path: str = DATA_PATH):
+    """ Save the typed, dictionary encoded, uncompressed Arrow IPC copy of a dataset so it can be memory-mapped
+
+    Args:
+        df (pd.DataFrame): results dataset
+        csv_path (str): csv dataset path
+    """
+    df = compact_dataset(df[list(DATA_DTYPES)].astype(DATA_DTYPES).reset_index(drop=True))
+    with atomic_path(get_arrow_path(csv_path)) as tmp_path:
+        feather.write_feather(df, tmp_path, compression='uncompressed')
+
+
+def get_sqlite_path(csv_path: str) -> str:
+    """ Get the path of the indexed SQLite copy of a csv dataset
+
+    Args:
+        csv_path (str): csv dataset path
+
+    Returns:
+        str
+    """
+    return os.path.splitext(csv_path)[0] + '.sqlite'
+
+
+def write_sqlite_dataset(df: pd.DataFrame, csv_path: str = DATA_PATH):
+    """ Save the typed, indexed SQLite copy of a dataset, rows keep the dataset order and the dataset version is stored
+
+    Args:
+        df (pd.DataFrame): results dataset
+        csv_path (str): csv dataset path
+    """
+    df = df[list(DATA_DTYPES)].astype(DATA_DTYPES).reset_index(drop=True)
+    with atomic_path(get_sqlite_path(csv_path)) as tmp_path:
+        connection = sqlite3.connect(tmp_path)
+        try:
+            with connection:
+                columns = ', '.join(f'{column} {column_type}'
+                                    for column, column_type in SQLITE_COLUMN_TYPES.items())
+                connection.execute(f'CREATE TABLE results ({columns})')
+                rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+                connection.executemany(f'INSERT INTO results VALUES ({", ".join("?" * len(DATA_DTYPES))})', rows)
+                for name, index_columns in SQLITE_INDEXES.items():
+                    connection.execute(f'CREATE INDEX {name} ON results ({", ".join(index_columns)})')
+                connection.execute('CREATE TABLE metadata (key TEXT PRIMARY KEY, value TEXT)')
+                connection.execute("INSERT INTO metadata VALUES ('version', ?)", (dataset_version(df),))
+            connection.execute('ANALYZE')
+        finally:
+            connection.close()
+
+
+def write_dataset(df: pd.DataFrame, csv_path: str = DATA_PATH):
+    """ Save dataset as csv, as an indexed SQLite copy and, if pyarrow is installed, as a columnar copy next to it
+
+    Args:
+        df (pd.DataFrame): results dataset
+        csv_path (str): csv dataset path
+    """
+    df.to_csv(csv_path, index=False)
+    write_sqlite_dataset(df, csv_path)
+    if pa is not None:
+        write_arrow_dataset(df, csv_path)
+
+
+def load_dataset(csv_path: str = DATA_PATH) -> pd.DataFrame:
+    """ Load dataset with categorical string columns from its memory-mapped Arrow copy, falling back to the csv if
+    there is no copy
+
+    Args:
+        csv_path (str): csv dataset path
+
+    Returns:
+        pd.DataFrame
+    """
+    arrow_path = get_arrow_path(csv_path)
+    if pa is not None and os.path.exists(arrow_path):
+        with pa.memory_map(arrow_path, 'r') as source:
+            table = pa.ipc.open_file(source).read_all()
+        # string columns are stored dictionary encoded and load as categoricals, numeric columns are not copied so
+        # the mapped pages are shared between processes
+        return compact_dataset(table.to_pandas(split_blocks=True), copy=False)
+    return compact_dataset(read_results_csv(csv_path).astype(DATA_DTYPES))
+
+
+class SqliteDataset:
+    """ Read only queries of the SQLite copy of a dataset, filters and aggregations run in SQLite
+
+    Every thread and forked process opens its own connection. Returned frames have the dataset column types and
+    rows in dataset order, like the matching pandas queries.
+
+    Args:
+        path (str): SQLite dataset path
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self.version = self._query_value("SELECT value FROM metadata WHERE key = 'version'")
+
+    def _connection(self) -> sqlite3.Connection:
+        if getattr(self._local, 'pid', None) != os.getpid():
+            self._local.connection = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True)
+            self._local.pid = os.getpid()
+        return self._local.connection
+
+    def _query_value(self, sql: str, params: tuple = ()):
+        return self._connection().execute(sql, params).fetchone()[0]
+
+    def _query_column(self, sql: str, params: tuple = ()) -> list:
+        return [row[0] for row in self._connection().execute(sql, params)]
+
+    @staticmethod
+    def _filters(comp_division: str, division: str = None, region: str = 'all') -> tuple:
+        conditions = ['comp_division = ?']
+        params = [comp_division]
+        if division is not None:
+            conditions.append('division = ?')
+            params.append(division)
+        if region != 'all':
+            conditions.append('Region = ?')
+            params.append(region)
+        return ' AND '.join(conditions), tuple(params)
+
+    def comp_divisions(self) -> list:
+        """ Get competitive divisions in order of first appearance """
+        return self._query_column('SELECT comp_division FROM results GROUP BY comp_division ORDER BY MIN(rowid)')
+
+    def divisions(self, comp_division: str) -> list:
+        """ Get sub divisions of a competitive division in order of first appearance """
+        where, params = self._filters(comp_division)
+        return self._query_column(f'SELECT division FROM results WHERE {where} GROUP BY division '
+                                  f'ORDER BY MIN(rowid)', params)
+
+    def regions(self, comp_division: str, division: str) -> list:
+        """ Get regions of a sub division in order of first appearance """
+        where, params = self._filters(comp_division, division)
+        return self._query_column(f'SELECT Region FROM results WHERE {where} GROUP BY Region ORDER BY MIN(rowid)',
+                                  params)
+
+    def subset(self, comp_division: str, division: str, region: str = 'all') -> pd.DataFrame:
+        """ Get the results of a subset
+
+        Args:
+            comp_division (str): competitive division name
+            division (str): gendered sub division name
+            region (str): region name, 'all' for every region
+
+        Returns:
+            pd.DataFrame
+        """
+        where, params = self._filters(comp_division, division, region)
+        df = pd.read_sql_query(f'SELECT {", ".join(DATA_DTYPES)} FROM results WHERE {where} ORDER BY rowid',
+                               self._connection(), params=params)
+        return df.astype(DATA_DTYPES)
+
+    def team_summary(self, comp_division: str, division: str, region: str = 'all') -> pd.DataFrame:
+        """ Get appearances, average placement and average spirit score per team of a subset
+
+        Args:
+            comp_division (str): competitive division name
+            division (str): gendered sub division name
+            region (str): region name, 'all' for every region
+
+        Returns:
+            pd.DataFrame
+        """
+        where, params = self._filters(comp_division, division, region)
+        df = pd.read_sql_query(f'SELECT Team, COUNT(year) AS count, AVG(Standing) AS avg_rank, '
+                               f'AVG(SpiritScores) AS avg_spirit FROM results WHERE {where} '
+                               f'GROUP BY Team ORDER BY Team', self._connection(), params=params)
+        return df.astype({'avg_rank': 'float64', 'avg_spirit': 'float64'})
+
+
+if __name__ == '__main__':
+    # rebuild the columnar and SQLite copies from the csv
+    results = read_results_csv(DATA_PATH)
+    if pa is not None:
+        write_arrow_dataset(results, DATA_PATH)
+    write_sqlite_dataset(results, DATA_PATH)
@@ -0,0 +1,176 @@
+import difflib
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from scrape_utils import ALIAS_COLUMNS, TEAM_ALIASES_PATH, load_team_aliases
+
+# character n-grams used to block names, only names sharing n-grams are compared
+NGRAM_SIZE = 3
+# n-grams shared by more names than this, like 'UNI' in college names, are too common to block on
+MAX_BLOCK_SIZE = 200
+# min share of n-grams two names have in common to be compared
+MIN_NGRAM_JACCARD = 0.4
+# min difflib similarity of normalized names proposed as the same team
+MIN_SIMILARITY = 0.8
+
+
+def normalize_team(name: str) -> str:
+    """ Normalize team name for matching, case, accents, punctuation and '&' vs 'AND' are ignored
+
+    Args:
+        name (str): team name
+
+    Returns:
+        str
+    """
+    name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii').upper()
+    name = name.replace('&', ' AND ')
+    return ' '.join(re.findall(r'[A-Z0-9]+', name))
+
+
+def _ngrams(name: str, n: int = NGRAM_SIZE) -> set:
+    padded = f' {name} '
+    return {padded[i:i + n] for i in range(max(len(padded) - n + 1, 1))}
+
+
+def candidate_pairs(names: list, n: int = NGRAM_SIZE, max_block_size: int = MAX_BLOCK_SIZE,
+                    min_jaccard: float = MIN_NGRAM_JACCARD) -> pd.DataFrame:
+    """ Find pairs of names sharing enough n-grams using an inverted n-gram index instead of comparing all pairs
+
+    Only names in the same block (sharing an n-gram) are paired and shared n-grams are counted with numpy, n-grams
+    in more than max_block_size names are not indexed and don't count as shared.
+
+    Args:
+        names (list): normalized names
+        n (int): n-gram size
+        max_block_size (int): n-grams of more names are not indexed
+        min_jaccard (float): min jaccard similarity of the n-gram sets
+
+    Returns:
+        pd.DataFrame: left and right name positions with left < right and their n-gram jaccard similarity
+    """
+    name_grams = [_ngrams(name, n) for name in names]
+    sizes = np.array([len(grams) for grams in name_grams])
+    gram_ids = {}
+    postings_gram = np.array([gram_ids.setdefault(gram, len(gram_ids)) for grams in name_grams for gram in grams],
+                             dtype=np.int64)
+    postings_name = np.repeat(np.arange(len(names), dtype=np.int64), sizes)
+
+    # inverted index, postings sorted by n-gram then name
+    order = np.lexsort((postings_name, postings_gram))
+    postings_gram = postings_gram[order]
+    postings_name = postings_name[order]
+    block_start = np.searchsorted(postings_gram, postings_gram, side='left')
+    block_end = np.searchsorted(postings_gram, postings_gram, side='right')
+    indexed = (block_end - block_start) <= max_block_size
+
+    # pair every posting with the later postings of its block
+    pair_counts = np.where(indexed, block_end - np.arange(len(postings_gram)) - 1, 0)
+    left = np.repeat(np.arange(len(postings_gram)), pair_counts)
+    offsets = np.arange(len(left)) - np.repeat(np.cumsum(pair_counts) - pair_counts, pair_counts)
+    right = left + 1 + offsets
+    keys, shared = np.unique(postings_name[left] * len(names) + postings_name[right], return_counts=True)
+
+    left_names, right_names = np.divmod(keys, len(names))
+    jaccard = shared / (sizes[left_names] + sizes[right_names] - shared)
+    keep = jaccard >= min_jaccard
+    return pd.DataFrame({'left': left_names[keep], 'right': right_names[keep], 'jaccard': jaccard[keep]})
+
+
+def _find(parents: dict, name: str) -> str:
+    while parents[name] != name:
+        parents[name] = parents[parents[name]]
+        name = parents[name]
+    return name
+
+
+def propose_team_aliases(df: pd.DataFrame, min_similarity: float = MIN_SIMILARITY) -> pd.DataFrame:
+    """ Propose canonical names for teams that look like spelling variants of each other
+
+    Names are compared within a (comp_division, division) only if they share n-grams and never appeared at the
+    same nationals, matches are grouped and named after the team with the most appearances (then latest year).
+
+    Args:
+        df (pd.DataFrame): results with comp_division, division, Team and year columns
+        min_similarity (float): min similarity of normalized names
+
+    Returns:
+        pd.DataFrame: ALIAS_COLUMNS, status 'proposed'
+    """
+    proposals = []
+    for (comp_division, division), div_df in df.groupby(['comp_division', 'division']):
+        teams = div_df.groupby('Team').agg(count=('year', 'size'), last_year=('year', 'max'),
+                                           years=('year', frozenset))
+        names = teams.index.tolist()
+        normalized = [normalize_team(name) for name in names]
+        parents = {name: name for name in names}
+        similarities = {}
+        for left, right, _ in candidate_pairs(normalized).itertuples(index=False):
+            if teams['years'].iat[left] & teams['years'].iat[right]:
+                continue  # both played the same nationals so they are different teams
+            similarity = difflib.SequenceMatcher(None, normalized[left], normalized[right]).ratio()
+            if similarity < min_similarity:
+                continue
+            for name in (names[left], names[right]):
+                similarities[name] = max(similarities.get(name, 0), similarity)
+            parents[_find(parents, names[left])] = _find(parents, names[right])
+
+        groups = {}
+        for name in similarities:
+            groups.setdefault(_find(parents, name), []).append(name)
+        for group in groups.values():
+            canonical = max(group, key=lambda name: (teams.at[name, 'count'], teams.at[name, 'last_year'], name))
+            proposals += [(comp_division.lower(), division, name, canonical, round(similarities[name], 3),
+                           'proposed') for name in sorted(group) if name != canonical]
+    return pd.DataFrame(proposals, columns=ALIAS_COLUMNS)
+
+
+def update_team_aliases(df: pd.DataFrame, path: str = TEAM_ALIASES_PATH) -> pd.DataFrame:
+    """ Add new proposals to the alias table, reviewed entries ('accepted' or 'rejected') are kept as they are
+
+    Args:
+        df (pd.DataFrame): results dataset
+        path (str): alias table csv path
+
+    Returns:
+        pd.DataFrame: proposals that were not in the alias table yet
+    """
+    existing = load_team_aliases(path)
+    proposals = propose_team_aliases(df)
+    known = pd.MultiIndex.from_frame(existing[['div', 'division', 'alias']])
+    new = proposals[~pd.MultiIndex.from_frame(proposals[['div', 'division', 'alias']]).isin(known)]
+    if not new.empty:
+        aliases = pd.concat([existing, new], ignore_index=True).sort_values(['div', 'division', 'canonical', 'alias'])
+        aliases.to_csv(path, index=False)
+        load_team_aliases.cache_clear()
+    return new
+
+
+def print_alias_report(new: pd.DataFrame, df: pd.DataFrame, path: str = TEAM_ALIASES_PATH):
+    """ Print proposed merges with each name's appearances for review
+
+    Args:
+        new (pd.DataFrame): proposals from update_team_aliases
+        df (pd.DataFrame): results dataset
+        path (str): alias table csv path
+    """
+    if new.empty:
+        return
+    years = df.groupby([df.comp_division.str.lower(), 'division', 'Team']).year.agg(
+        lambda y: ', '.join(map(str, sorted(y))))
+    print(f'{len(new)} possible duplicate team names, set status to accepted or rejected in {path}')
+    for row in new.itertuples(index=False):
+        print(f'  {row.div} {row.division}: {row.alias!r} ({years.get((row.div, row.division, row.alias), "")}) -> '
+              f'{row.canonical!r} ({years.get((row.div, row.division, row.canonical), "")}), '
+              f'similarity {row.similarity}')
+    print('accepted aliases are applied by clean_data, rerun with --full --offline to apply them to all seasons')
+
+
+if __name__ == '__main__':
+    from data_utils import DATA_PATH, read_results_csv
+
+    results = read_results_csv(DATA_PATH)
+    print_alias_report(update_team_aliases(results), results)
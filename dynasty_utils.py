@@ -0,0 +1,194 @@
+import numpy as np
+import pandas as pd
+
+# worst placements counted as finals and semifinals appearances, losing semifinalists tie for 3rd
+FINALS_PLACE = 2
+SEMIS_PLACE = 4
+# number of consecutive nationals averaged for a team's peak
+PEAK_WINDOW = 3
+
+LEADERBOARD_COLUMNS = ['Team', 'Titles', 'Finals', 'Semis', 'Appearances', 'Longest Streak', 'Title Streak',
+                       'Peak Placement', 'Peak Years']
+
+
+def placement_matrix(div_df: pd.DataFrame) -> tuple:
+    """ Pivot the results of a division to a team x nationals placement matrix
+
+    Args:
+        div_df (pd.DataFrame): results of one division with Team, year and Standing columns
+
+    Returns:
+        tuple: (teams sorted by name, years with nationals, int16 placements with 0 where a team did not play)
+    """
+    team_codes, teams = pd.factorize(np.asarray(div_df['Team'], dtype=object), sort=True)
+    year_codes, years = pd.factorize(div_df['year'].to_numpy(), sort=True)
+    standings = np.zeros((len(teams), len(years)), dtype=np.int16)
+    standings[team_codes, year_codes] = div_df['Standing'].to_numpy()
+    return np.asarray(teams, dtype=object), [int(year) for year in years], standings
+
+
+def longest_runs(mask: np.ndarray) -> tuple:
+    """ Get the longest run of True values in every row and the run ending at the last column
+
+    Args:
+        mask (np.ndarray): 2d boolean array
+
+    Returns:
+        tuple: (longest run per row, run ending at the last column per row)
+    """
+    num_rows, num_columns = mask.shape
+    padded = np.zeros((num_rows, num_columns + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    # nonzero scans row by row so the n-th start and n-th end belong to the same run
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    lengths = ends - starts
+    longest = np.zeros(num_rows, dtype=np.int64)
+    np.maximum.at(longest, rows, lengths)
+    current = np.zeros(num_rows, dtype=np.int64)
+    is_current = ends == num_columns
+    current[rows[is_current]] = lengths[is_current]
+    return longest, current
+
+
+def peak_windows(standings: np.ndarray, window: int = PEAK_WINDOW) -> tuple:
+    """ Find the consecutive nationals with the best placement total of every team, windows with a missed nationals
+    don't count and ties go to the earliest window
+
+    Args:
+        standings (np.ndarray): team x nationals placements, 0 where a team did not play
+        window (int): number of consecutive nationals
+
+    Returns:
+        tuple: (best placement total per team, column of the window's last nationals or -1 if there is none)
+    """
+    num_teams, num_years = standings.shape
+    if num_years < window:
+        return np.zeros(num_teams, dtype=np.int64), np.full(num_teams, -1, dtype=np.int64)
+    played = np.zeros((num_teams, num_years + 1), dtype=np.int64)
+    played[:, 1:] = np.cumsum(standings > 0, axis=1)
+    total = np.zeros((num_teams, num_years + 1), dtype=np.int64)
+    total[:, 1:] = np.cumsum(standings, axis=1)
+    window_played = played[:, window:] - played[:, :-window]
+    window_total = np.where(window_played == window, total[:, window:] - total[:, :-window], np.iinfo(np.int64).max)
+    best = window_total.argmin(axis=1)
+    best_total = window_total[np.arange(num_teams), best]
+    has_peak = best_total < np.iinfo(np.int64).max
+    return np.where(has_peak, best_total, 0), np.where(has_peak, best + window - 1, -1)
+
+
+class DynastyMetrics:
+    """ Titles, finals and semis appearances, streaks and peak of every team of a division
+
+    All seasons are computed at once with run-length operations on the team x nationals placement matrix. Seasons
+    appended later only update the counters, the runs ending at the latest nationals and the window ending at it,
+    so only the last window of placements is kept.
+
+    Args:
+        teams (np.ndarray): team names
+        years (list): years with nationals
+        standings (np.ndarray): team x nationals placements, 0 where a team did not play
+        window (int): number of consecutive nationals averaged for the peak
+    """
+
+    def __init__(self, teams: np.ndarray, years: list, standings: np.ndarray, window: int = PEAK_WINDOW):
+        self.teams = teams
+        self.years = list(years)
+        self.window = window
+        self.titles = (standings == 1).sum(axis=1)
+        self.finals = ((standings > 0) & (standings <= FINALS_PLACE)).sum(axis=1)
+        self.semis = ((standings > 0) & (standings <= SEMIS_PLACE)).sum(axis=1)
+        self.appearances = (standings > 0).sum(axis=1)
+        self.streak, self.current_streak = longest_runs(standings > 0)
+        self.title_streak, self.current_title_streak = longest_runs(standings == 1)
+        self.peak_total, self.peak_end = peak_windows(standings, window)
+        self.recent = standings[:, -window:].copy()
+
+    @classmethod
+    def from_results(cls, div_df: pd.DataFrame, window: int = PEAK_WINDOW):
+        """ Compute the metrics of a division from its results
+
+        Args:
+            div_df (pd.DataFrame): results of one division
+            window (int): number of consecutive nationals averaged for the peak
+
+        Returns:
+            DynastyMetrics
+        """
+        return cls(*placement_matrix(div_df), window=window)
+
+    def append_season(self, year: int, season_df: pd.DataFrame):
+        """ Update the metrics with the results of a nationals after the latest one
+
+        Args:
+            year (int): year of the nationals
+            season_df (pd.DataFrame): results of the division that year
+        """
+        if self.years and year <= self.years[-1]:
+            raise ValueError(f'{year} nationals is not after the latest one ({self.years[-1]})')
+        season_teams = np.asarray(season_df['Team'], dtype=object)
+        rows = pd.Index(self.teams).get_indexer(season_teams)
+        if (rows < 0).any():
+            self._add_teams(np.unique(season_teams[rows < 0]))
+            rows = pd.Index(self.teams).get_indexer(season_teams)
+
+        placements = np.zeros(len(self.teams), dtype=np.int16)
+        placements[rows] = season_df['Standing'].to_numpy()
+        played = placements > 0
+        won = placements == 1
+        self.years.append(year)
+        self.titles += won
+        self.finals += played & (placements <= FINALS_PLACE)
+        self.semis += played & (placements <= SEMIS_PLACE)
+        self.appearances += played
+        self.current_streak = (self.current_streak + 1) * played
+        self.streak = np.maximum(self.streak, self.current_streak)
+        self.current_title_streak = (self.current_title_streak + 1) * won
+        self.title_streak = np.maximum(self.title_streak, self.current_title_streak)
+
+        self.recent = np.column_stack([self.recent, placements])[:, -self.window:]
+        if self.recent.shape[1] == self.window:
+            complete = (self.recent > 0).all(axis=1)
+            total = self.recent.sum(axis=1, dtype=np.int64)
+            better = complete & ((self.peak_end < 0) | (total < self.peak_total))
+            self.peak_total = np.where(better, total, self.peak_total)
+            self.peak_end = np.where(better, len(self.years) - 1, self.peak_end)
+
+    def _add_teams(self, new_teams: np.ndarray):
+        num_new = len(new_teams)
+        self.teams = np.concatenate([self.teams, new_teams])
+        for name in ('titles', 'finals', 'semis', 'appearances', 'streak', 'current_streak', 'title_streak',
+                     'current_title_streak', 'peak_total'):
+            setattr(self, name, np.concatenate([getattr(self, name), np.zeros(num_new, dtype=np.int64)]))
+        self.peak_end = np.concatenate([self.peak_end, np.full(num_new, -1, dtype=np.int64)])
+        self.recent = np.vstack([self.recent, np.zeros((num_new, self.recent.shape[1]), dtype=np.int16)])
+
+    def leaderboard(self, teams: list = None) -> pd.DataFrame:
+        """ Get the metrics as a table ordered by titles, finals, semis and appearances
+
+        Args:
+            teams (list): only include these teams, default is every team
+
+        Returns:
+            pd.DataFrame: LEADERBOARD_COLUMNS, peak placement is the average over the peak years
+        """
+        years = np.array(self.years, dtype=np.int64)
+        has_peak = self.peak_end >= 0
+        first_years = years[np.maximum(self.peak_end - self.window + 1, 0)].astype(str).astype(object)
+        last_years = years[np.maximum(self.peak_end, 0)].astype(str).astype(object)
+        peak_years = np.where(has_peak, first_years + '-' + last_years, '')
+        board = pd.DataFrame({'Team': self.teams,
+                              'Titles': self.titles,
+                              'Finals': self.finals,
+                              'Semis': self.semis,
+                              'Appearances': self.appearances,
+                              'Longest Streak': self.streak,
+                              'Title Streak': self.title_streak,
+                              'Peak Placement': np.where(has_peak, self.peak_total / self.window, np.nan).round(2),
+                              'Peak Years': peak_years}, columns=LEADERBOARD_COLUMNS)
+        if teams is not None:
+            board = board[board['Team'].isin(teams)]
+        board = board.sort_values(['Titles', 'Finals', 'Semis', 'Appearances', 'Team'],
+                                  ascending=[False, False, False, False, True], kind='mergesort')
+        return board.reset_index(drop=True)
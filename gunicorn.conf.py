@@ -0,0 +1,19 @@
+# gunicorn settings, read automatically by `gunicorn app:server`
+import gc
+
+# load the app, dataset and query cache once in the master so forked workers share them copy-on-write
+preload_app = True
+
+
+def when_ready(server):
+    from app import startup_report
+    import visualize_usau_module
+
+    num_views = visualize_usau_module.warm_query_cache()
+    server.log.info(f'warmed query cache with {num_views} filter views')
+    if not visualize_usau_module.VIEWS:
+        # the views are committed with the dataset, rebuild them with `python visualize_usau_module.py`
+        server.log.warning(f'{visualize_usau_module.VIEWS_PATH} is missing or stale, views are computed live')
+    server.log.info(startup_report())
+    # keep startup objects out of the garbage collector so collections in workers don't copy their pages
+    gc.freeze()
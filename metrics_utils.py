@@ -0,0 +1,253 @@
+import cProfile
+import functools
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, request
+
+# upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# upper bounds in bytes of the payload size histogram buckets
+SIZE_BUCKETS = (1000, 10000, 100000, 1000000, 10000000)
+# share of callback calls run under cProfile, 0 to disable profiling
+PROFILE_SAMPLE_RATE = 0.0
+# profiled calls slower than this many seconds are saved
+SLOW_CALLBACK_SECONDS = 0.5
+PROFILE_DIR = './data/profiles'
+
+
+class Histogram:
+    """ Cumulative histogram with a sum and a count, like a Prometheus histogram
+
+    Args:
+        buckets (tuple): sorted bucket upper bounds
+    """
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name: str, labels: tuple) -> list:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{_format_labels(labels + (("le", bound),))} {cumulative}')
+        lines.append(f'{name}_sum{_format_labels(labels)} {self.sum}')
+        lines.append(f'{name}_count{_format_labels(labels)} {self.count}')
+        return lines
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+
+class Metrics:
+    """ Latency, stage and payload metrics of Dash callbacks, rendered in the Prometheus text format
+
+    Callbacks wrapped with callback() record their wall time. Code run inside stage() records its own time,
+    excluding nested stages, labelled with the running callback. When installed on the Flask server, responses of
+    the callback endpoint record their size and the time spent serializing after the callback returned. Metrics
+    are kept per process, every gunicorn worker reports its own.
+
+    Args:
+        profile_rate (float): share of callback calls run under cProfile
+        slow_seconds (float): profiled calls slower than this are saved to profile_dir
+        profile_dir (str): directory of saved profiles
+    """
+
+    def __init__(self, profile_rate: float = PROFILE_SAMPLE_RATE, slow_seconds: float = SLOW_CALLBACK_SECONDS,
+                 profile_dir: str = PROFILE_DIR):
+        self.profile_rate = profile_rate
+        self.slow_seconds = slow_seconds
+        self.profile_dir = profile_dir
+        self._histograms = OrderedDict()
+        self._gauges = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def observe(self, name: str, value: float, buckets: tuple = LATENCY_BUCKETS, **labels):
+        """ Add value to the histogram name with labels
+
+        Args:
+            name (str): metric name
+            value (float): observed value
+            buckets (tuple): bucket upper bounds of a new histogram
+            **labels: metric labels
+        """
+        key = (name, tuple(labels.items()))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges[(name, tuple(labels.items()))] = value
+
+    @contextmanager
+    def stage(self, name: str):
+        """ Time a stage of the running callback, time of nested stages is only counted for them
+
+        Args:
+            name (str): stage name, e.g. subset, aggregate or figure
+        """
+        stack = self._local.__dict__.setdefault('stages', [])
+        frame = [0.0]  # time spent in nested stages
+        stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            stack.pop()
+            if stack:
+                stack[-1][0] += elapsed
+            self.observe('stage_seconds', elapsed - frame[0],
+                         callback=getattr(self._local, 'callback', 'none'), stage=name)
+
+    def timed_stage(self, name: str):
+        """ Decorator timing every call of a function as stage name
+
+        Args:
+            name (str): stage name
+
+        Returns:
+            decorator
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def annotate(self, **labels):
+        """ Label the running callback's latency with the filters it was called with
+
+        Every distinct set of labels is kept as its own series, so values posted by clients must be mapped to a
+        bounded set first.
+
+        Args:
+            **labels: labels, e.g. comp_division, division and region
+        """
+        self._local.labels = labels
+
+    def callback(self, func):
+        """ Decorator recording the wall time of a Dash callback, place it below @app.callback
+
+        A sample of calls is profiled and saved to profile_dir if slower than slow_seconds.
+
+        Args:
+            func: callback function
+
+        Returns:
+            wrapped callback
+        """
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            self._local.callback = func.__name__
+            self._local.labels = None
+            self._local.stages = []
+            profiler = cProfile.Profile() if random.random() < self.profile_rate else None
+            start = time.perf_counter()
+            try:
+                if profiler is not None:
+                    return profiler.runcall(func, *args, **kwargs)
+                return func(*args, **kwargs)
+            finally:
+                end = time.perf_counter()
+                elapsed = end - start
+                self.observe('callback_seconds', elapsed, callback=func.__name__)
+                if self._local.labels:
+                    self.observe('filter_seconds', elapsed, **self._local.labels)
+                if profiler is not None and elapsed >= self.slow_seconds:
+                    self._save_profile(profiler, func.__name__)
+                if has_request_context():
+                    g.metrics_callback = func.__name__
+                    g.metrics_callback_end = end
+                self._local.callback = 'none'
+        return wrapper
+
+    def _save_profile(self, profiler: cProfile.Profile, name: str):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        path = os.path.join(self.profile_dir, f'{name}_{time.strftime("%Y%m%d-%H%M%S")}_{os.getpid()}.prof')
+        profiler.dump_stats(path)
+
+    def init_app(self, server, path_suffix: str = '_dash-update-component'):
+        """ Record payload size and serialization time of callback responses and serve the metrics at /metrics
+
+        Register before other after_request hooks so sizes are measured as sent, e.g. after compression.
+
+        Args:
+            server (flask.Flask): server of the Dash app
+            path_suffix (str): path of the callback endpoint
+        """
+        @server.before_request
+        def start_timer():
+            if request.path.endswith(path_suffix):
+                g.metrics_request_start = time.perf_counter()
+
+        @server.after_request
+        def record_response(response):
+            start = g.pop('metrics_request_start', None)
+            if start is None:
+                return response
+            end = time.perf_counter()
+            callback = g.pop('metrics_callback', 'cached')
+            callback_end = g.pop('metrics_callback_end', None)
+            if callback_end is not None:
+                self.observe('stage_seconds', end - callback_end, callback=callback, stage='serialize')
+            self.observe('request_seconds', end - start, callback=callback)
+            if not response.direct_passthrough:
+                self.observe('response_bytes', len(response.get_data()), SIZE_BUCKETS, callback=callback)
+            return response
+
+        @server.route('/metrics')
+        def metrics():
+            return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+    def render(self) -> str:
+        """ Get all metrics in the Prometheus text format
+
+        Returns:
+            str
+        """
+        lines = []
+        with self._lock:
+            for name in OrderedDict.fromkeys(name for name, _ in self._histograms):
+                lines.append(f'# TYPE {name} histogram')
+                for (other_name, labels), histogram in self._histograms.items():
+                    if other_name == name:
+                        lines.extend(histogram.lines(name, labels))
+            for name in OrderedDict.fromkeys(name for name, _ in self._gauges):
+                lines.append(f'# TYPE {name} gauge')
+                for (other_name, labels), value in self._gauges.items():
+                    if other_name == name:
+                        lines.append(f'{name}{_format_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+# metrics of this process, shared by the app and the query builders
+METRICS = Metrics()
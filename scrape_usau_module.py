@@ -1,27 +1,112 @@
+import argparse
+import os
+from datetime import date
+
 import pandas as pd
-from scrape_utils import get_data_for_year, region_correction
+from data_utils import read_results_csv, write_dataset, DATA_PATH
+from dedup_utils import print_alias_report, update_team_aliases
+from scrape_utils import iter_data_for_years, merge_new_data, clear_checkpoints, CHECKPOINT_DIR
 
-# years to scrap
+# years to scrap, through the current season
 start_year = 1979
-end_year = 2019
+end_year = date.today().year
+
+# seasons scraped without nationals results (e.g. college before 1984), skipped when looking for missing seasons
+EMPTY_SEASONS_PATH = './data/empty_seasons.csv'
+
+COMP_DIVISION_NAMES = {'club': 'Club', 'college': 'College'}
+
+
+def load_empty_seasons(path: str = EMPTY_SEASONS_PATH) -> set:
+    """ Load the seasons known to have no nationals results
+
+    Args:
+        path (str): empty seasons csv path
+
+    Returns:
+        set: (year, div) tuples
+    """
+    if not os.path.exists(path):
+        return set()
+    empty_df = pd.read_csv(path)
+    return set(zip(empty_df['year'].astype(int), empty_df['div']))
+
+
+def save_empty_seasons(seasons: set, path: str = EMPTY_SEASONS_PATH):
+    """ Save the seasons known to have no nationals results
+
+    Args:
+        seasons (set): (year, div) tuples
+        path (str): empty seasons csv path
+    """
+    pd.DataFrame(sorted(seasons), columns=['year', 'div']).to_csv(path, index=False)
+
+
+def get_jobs(existing_df: pd.DataFrame, years: list = None, empty_seasons: set = frozenset()) -> list:
+    """ Get (year, div) pages to scrape, all given years or else the seasons missing from the existing dataset
+
+    Args:
+        existing_df (pd.DataFrame): existing dataset
+        years (list): years to (re)scrape
+        empty_seasons (set): (year, div) seasons without results, not missing
+
+    Returns:
+        list
+    """
+    if years:
+        return [(year, div) for year in years for div in COMP_DIVISION_NAMES]
+    if existing_df.empty:
+        done = set()
+    else:
+        done = set(zip(existing_df.year, existing_df.comp_division))
+    return [(year, div) for year in range(start_year, end_year + 1) for div in COMP_DIVISION_NAMES
+            if (year, COMP_DIVISION_NAMES[div]) not in done and (year, div) not in empty_seasons]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scrape USAU nationals results into ' + DATA_PATH)
+    parser.add_argument('years', nargs='*', type=int, help='years to (re)scrape, default is all missing years')
+    parser.add_argument('--full', action='store_true', help='rebuild the dataset from scratch')
+    parser.add_argument('--offline', action='store_true', help='only use cached archive pages')
+    args = parser.parse_args()
+
+    if args.full or not os.path.exists(DATA_PATH):
+        existing_df = pd.DataFrame()
+    else:
+        existing_df = read_results_csv(DATA_PATH)
+
+    empty_seasons = load_empty_seasons()
+    jobs = get_jobs(existing_df, args.years, empty_seasons)
+    if not jobs:
+        print('dataset is up to date')
+        return
+
+    # each year get club and college data, fetched concurrently but returned in (year, div) order
+    results = list(iter_data_for_years(jobs, offline=args.offline, checkpoint_dir=CHECKPOINT_DIR))
+    new_data = pd.concat([year_data.assign(comp_division=COMP_DIVISION_NAMES[div])
+                          for (year, div), year_data in results], sort=False)
 
-# each year get club and college data
-all_data = pd.DataFrame()
-for year in range(start_year, end_year+1):
-    print(year)
-    club_data = get_data_for_year(year, div='club')
-    club_data['comp_division'] = 'Club'
-    col_data = get_data_for_year(year, div='college')
-    col_data['comp_division'] = 'College'
-    all_data = pd.concat([all_data, club_data, col_data], sort=False)
+    # past seasons without results had no nationals, the current one may not have been played yet
+    if not args.offline:
+        scraped = {job for job, _ in results}
+        found_empty = {job for job, year_data in results if year_data.empty and job[0] < date.today().year}
+        if found_empty != empty_seasons & scraped:
+            save_empty_seasons((empty_seasons - scraped) | found_empty)
+    if new_data.empty:
+        print('no new results found')
+    else:
+        all_data = merge_new_data(existing_df, new_data)
+        # save data
+        write_dataset(all_data, DATA_PATH)
 
-all_data.year = all_data.year.astype(int)
-all_data.Standing = all_data.Standing.astype(int)
+        # propose canonical names for duplicate teams, clean_data applies them once accepted
+        print_alias_report(update_team_aliases(all_data), all_data)
 
-# if team exists in later region use that one
-all_data_corrected = all_data.groupby(['comp_division', 'division', 'Team']).apply(region_correction).\
-    reset_index(drop=True)
+        # precompute every dashboard view, imported here since it loads the dataset just written
+        from visualize_usau_module import write_views
+        write_views()
+    clear_checkpoints(jobs)
 
 
-# save data
-all_data_corrected.to_csv('./data/national_data.csv', index=False)
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,45 @@
+import functools
+import hashlib
+import json
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import requests
 import pandas as pd
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from data_utils import atomic_path, read_results_csv
+
+try:
+    import lxml  # noqa: F401
+    FAST_HTML_PARSER = 'lxml'
+except ImportError:
+    FAST_HTML_PARSER = 'html.parser'
+
+# archive page location, can be pointed at a local server that serves saved pages
+ARCHIVE_URL = 'https://www.usaultimate.org/archives/{year}_{div}.aspx'
+
+# fetch settings
+MAX_WORKERS = 8
+REQUEST_TIMEOUT = 30  # seconds
+MAX_RETRIES = 5
+BACKOFF_FACTOR = 0.5  # sleeps 0.5, 1, 2, 4... seconds between retries
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# archive pages are cached here with their ETag/Last-Modified headers
+CACHE_DIR = './data/cache'
+
+# per (year, div) results are saved here as they finish so a crashed scrape can resume
+CHECKPOINT_DIR = './data/checkpoints'
+
+REGION_GROUP_COLUMNS = ['comp_division', 'division', 'Team']
+
+# only the division headers and tables are kept when parsing an archive page
+NATIONALS_TAGS = SoupStrainer(['h3', 'table'])
 
 # used for renaming divisions
 CLUB_DIV_NAMES = [' MIXED ', ' MENS ', 'CO-ED ', ' OPEN ', ' WOMENS ']
@@ -9,7 +48,18 @@ COLLEGE_DIV_NAMES = [['D-I ', 'Open'], ['D-I ', 'Men\'s'], ['D-I ', 'Women\'s'],
 COLLEGE_DIV_NAMES_2 = ['College Championships: Open Division',
                        'College Championships: Women\'s Division']
 
-# todo: double check all for spelling/duplicate teams (use fuzzy matching) after region/division rework
+# corrections for misspelled teams/regions and renamed divisions
+CLEANING_RULES_PATH = './data/cleaning_rules.csv'
+
+# canonical names of duplicate teams per division, proposed by dedup_utils and reviewed by hand
+TEAM_ALIASES_PATH = './data/team_aliases.csv'
+ALIAS_COLUMNS = ['div', 'division', 'alias', 'canonical', 'similarity', 'status']
+
+# characters removed (or replaced) in one pass per column
+STANDING_CHARS = str.maketrans('', '', 'T ')
+TEAM_CHARS = str.maketrans('', '', '\xa0*')
+REGION_CHARS = str.maketrans('', '', '\xa0')
+SPIRIT_CHARS = str.maketrans(',', '.', ' *')
 
 
 def parse_college_div(divisions: list) -> list:
@@ -35,80 +85,134 @@ def parse_club_div(divisions: list) -> list:
     return new_divs
 
 
-def clean_data(df: pd.DataFrame, div: str, year: int) -> pd.DataFrame:
+@functools.lru_cache(maxsize=None)
+def load_cleaning_rules(path: str = CLEANING_RULES_PATH) -> pd.DataFrame:
+    """ Load value corrections from a csv file
+
+    Each rule sets `column` to `new` where `match_column` equals `old`. Rules apply to a competitive division
+    (`div` is 'club', 'college' or 'all') and an optional inclusive year range (`min_year`, `max_year`).
+    Chained rules are resolved, e.g. OPEN -> MENS with MENS -> X maps OPEN to X.
+
+    Rules are applied per (`column`, `match_column`) pair in the order each pair first appears in the file, so a
+    pair matching on a column sees the corrections earlier pairs made to it, e.g. regions matched on team names
+    after the team name rules.
+
+    Args:
+        path (str): rules csv path
+
+    Returns:
+        pd.DataFrame
+    """
+    rules = pd.read_csv(path, dtype=str, keep_default_na=False)
+    rules['min_year'] = pd.to_numeric(rules['min_year'], errors='coerce')
+    rules['max_year'] = pd.to_numeric(rules['max_year'], errors='coerce')
+    return rules
+
+
+def _resolve_chains(mapping: dict) -> dict:
+    resolved = {}
+    for old, new in mapping.items():
+        seen = {old}
+        while new in mapping and new not in seen:
+            seen.add(new)
+            new = mapping[new]
+        resolved[old] = new
+    return resolved
+
+
+def apply_cleaning_rules(df: pd.DataFrame, rules: pd.DataFrame, div: str, year: int) -> pd.DataFrame:
+    """ Apply the rules for a season with one dict lookup per (column, match_column) pair, pairs in file order
+
+    Args:
+        df (pd.DataFrame): results for one season
+        rules (pd.DataFrame): rules from load_cleaning_rules
+        div (str): 'club' or 'college'
+        year (int): season year
+
+    Returns:
+        pd.DataFrame
+    """
+    in_scope = rules['div'].isin(['all', div]) & ~(rules['min_year'] > year) & ~(rules['max_year'] < year)
+    for (column, match_column), column_rules in rules[in_scope].groupby(['column', 'match_column'], sort=False):
+        if match_column not in df.columns:
+            continue
+        mapping = dict(zip(column_rules['old'], column_rules['new']))
+        if column == match_column:
+            mapping = _resolve_chains(mapping)
+        new_values = df[match_column].map(mapping)
+        if column in df.columns:
+            df[column] = new_values.where(new_values.notna(), df[column])
+        else:
+            df[column] = new_values
+    return df
+
+
+@functools.lru_cache(maxsize=None)
+def load_team_aliases(path: str = TEAM_ALIASES_PATH) -> pd.DataFrame:
+    """ Load the team alias table, each row maps `alias` to `canonical` within a competitive division (`div`) and
+    `division` once its `status` is 'accepted'
+
+    Args:
+        path (str): alias table csv path
+
+    Returns:
+        pd.DataFrame
+    """
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=ALIAS_COLUMNS)
+    return pd.read_csv(path, dtype={'div': str, 'division': str, 'alias': str, 'canonical': str, 'status': str},
+                       keep_default_na=False)
+
+
+def apply_team_aliases(df: pd.DataFrame, aliases: pd.DataFrame, div: str) -> pd.DataFrame:
+    """ Rename teams to their accepted canonical names
+
+    Args:
+        df (pd.DataFrame): results for one season with cleaned division names
+        aliases (pd.DataFrame): aliases from load_team_aliases
+        div (str): 'club' or 'college'
+
+    Returns:
+        pd.DataFrame
+    """
+    accepted = aliases[(aliases['div'] == div) & (aliases['status'] == 'accepted')]
+    if accepted.empty or 'division' not in df.columns:
+        return df
+    mapping = dict(zip(zip(accepted['division'], accepted['alias']), accepted['canonical']))
+    new_teams = pd.Series([mapping.get(key) for key in zip(df['division'], df['Team'])], index=df.index,
+                          dtype=object)
+    df['Team'] = new_teams.where(new_teams.notna(), df['Team'])
+    return df
+
+
+def clean_data(df: pd.DataFrame, div: str, year: int, rules: pd.DataFrame = None,
+               aliases: pd.DataFrame = None) -> pd.DataFrame:
+    if rules is None:
+        rules = load_cleaning_rules()
+    if aliases is None:
+        aliases = load_team_aliases()
     df = df.copy()
     df = df.rename(columns={'School': 'Team'})
     df.dropna(subset=['Standing', 'Team'], how='any', inplace=True)
 
     df.columns = df.columns.str.replace(' ', '')
 
-    df.Standing = df.Standing.str.replace('T', '')  # ties
-    df.Standing = df.Standing.str.replace(' ', '')
+    df.Standing = df.Standing.str.translate(STANDING_CHARS)  # ties
     df = df[~df.Standing.isin(['?', 'DQ', 'DNF'])]  # remove DQ'd teams
     df['Standing'] = df['Standing'].astype(int)
 
     if div == 'club':
         df.Team = df.Team.str.upper()
-    df.Team = df.Team.str.replace('\xa0', '')
-    df.Team = df.Team.str.replace(r'*', '')
-    df.Team = df.Team.str.strip()
-
-    # team name corrections
-    # college
-    df.loc[df.Team == 'Carleton College-Syzygy', 'Team'] = 'Carleton College'
-    df.loc[df.Team == 'Massachussets', 'Team'] = 'Massachusetts'
-    df.loc[df.Team == 'Northwestern', 'Region'] = 'Great Lakes'
-
-    # club
-    df.loc[df.Team == 'BOHDI', 'Team'] = 'BODHI'
-    df.loc[df.Team == 'SHAME', 'Team'] = 'SHAME.'
-    df.loc[df.Team == 'ODYSSEE', 'Team'] = 'ODYSSÉE.'
-    df.loc[df.Team == 'GRAFITTI', 'Team'] = 'GRAFFITI'
-    df.loc[df.Team == 'DISCTRICT 5', 'Team'] = 'DISTRICT 5'
-    df.loc[df.Team == 'HOLES AND POLES', 'Team'] = 'HOLES & POLES'
-    df.loc[df.Team == 'HOMEBROOD', 'Team'] = 'HOME BROOD'
-    df.loc[df.Team == '7EXPRESS', 'Team'] = '7 EXPRESS'
-    df.loc[df.Team == 'COLUMBUS COCKTAILS', 'Team'] = 'COCKTAILS'
-    df.loc[df.Team == 'LOOSE CANON', 'Team'] = 'LOOSE CANNON'
-
-    # division corrections
-    df.loc[df.division == 'OPEN', 'division'] = 'MENS'
-    df.loc[df.division == 'CO-ED', 'division'] = 'MIXED'
-    df.loc[df.division == 'D-I Open', 'division'] = 'D-I Men\'s'
-    df.loc[df.division == 'D-III Open', 'division'] = 'D-III Men\'s'
-    df.loc[df.division == 'College Championships: Open Division', 'division'] = 'Men\'s'
-    df.loc[df.division == 'College Championships: Women\'s Division', 'division'] = 'Women\'s'
-
-    # region corrections
-    df.Region = df.Region.str.replace('\xa0', '')
-    df.loc[df.Region == 'Sothwest', 'Region'] = 'Southwest'
-    df.loc[df.Region == 'Norwest', 'Region'] = 'Northwest'
-    df.loc[df.Region == 'Mid-Atlantic', 'Region'] = 'Mid Atlantic'
-    df.loc[df.Region == 'SoutentralCh', 'Region'] = 'South Central'
-    df.loc[df.Region == 'New England ', 'Region'] = 'New England'
-    df.loc[df.Region == 'Oberlin', 'Region'] = 'Ohio Valley'
-    df.loc[pd.isna(df.Region), 'Region'] = 'Unknown'
-    df.loc[df.Region == '', 'Region'] = 'Unknown'
+    df.Team = df.Team.str.translate(TEAM_CHARS).str.strip()
+    df.Region = df.Region.fillna('').str.translate(REGION_CHARS)
 
-    if div == 'club':
-        df.loc[df.Region == 'Central', 'Region'] = 'Central (pre-2012)'
-        df.loc[df.Region == 'South', 'Region'] = 'South (pre-2012)'
-        df.loc[df.Region == 'West', 'Region'] = 'West (pre-1995)'
-    elif div == 'college':
-        df.loc[df.division == 'Men\'s', 'division'] = 'Men\'s (pre-2010)'
-        df.loc[df.division == 'Women\'s', 'division'] = 'Women\'s (pre-2010)'
-        df.loc[df.Region == 'Central', 'Region'] = 'Central (pre-2011)'
-        df.loc[df.Region == 'South', 'Region'] = 'South (pre-2011)'
-        df.loc[df.Region == 'Mid Atlantic', 'Region'] = 'Mid Atlantic (pre-1999)'
-        df.loc[df.Region == 'Northeast', 'Region'] = 'Northeast (pre-1999)'
-        df.loc[df.Region == 'West', 'Region'] = 'West (pre-1999)'
+    # team, division and region corrections, then duplicate team names
+    df = apply_cleaning_rules(df, rules, div, year)
+    df = apply_team_aliases(df, aliases, div)
 
     # spirit scores corrections
     if 'SpiritScores' in df.columns:
-        df['SpiritScores'] = df['SpiritScores'].str.replace(' *', '')
-        df['SpiritScores'] = df['SpiritScores'].str.replace('*', '')
-        df['SpiritScores'] = df['SpiritScores'].str.replace(',', '.')
-        df['SpiritScores'] = df['SpiritScores'].astype(float)
+        df['SpiritScores'] = df['SpiritScores'].str.translate(SPIRIT_CHARS).astype(float)
 
         # convert old spirit score (1-5) to WFDF system (0-20)
         if year <= 2013:
@@ -126,13 +230,113 @@ def clean_data(df: pd.DataFrame, div: str, year: int) -> pd.DataFrame:
     return df
 
 
-def get_data_for_year(year: int, div: str) -> pd.DataFrame:
-
-    # get request from usau archives site
-    url = f'https://www.usaultimate.org/archives/{year}_{div}.aspx'
-    response = requests.get(url)
-
-    soup = BeautifulSoup(response.text, 'html.parser')
+def get_session(max_workers: int = MAX_WORKERS) -> requests.Session:
+    """ Create a session with a connection pool sized for max_workers and retry/backoff on flaky responses
+
+    Args:
+        max_workers (int): number of concurrent requests the session will be shared by
+
+    Returns:
+        requests.Session
+    """
+    retry = Retry(total=MAX_RETRIES, backoff_factor=BACKOFF_FACTOR, status_forcelist=RETRY_STATUSES)
+    adapter = HTTPAdapter(pool_maxsize=max_workers, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def _cache_paths(url: str, cache_dir: str) -> tuple:
+    key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, f'{key}.html'), os.path.join(cache_dir, f'{key}.json')
+
+
+def _write_atomic(path: str, text: str):
+    with atomic_path(path) as tmp_path, open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def get_archive_page(year: int, div: str, session: requests.Session = None, base_url: str = ARCHIVE_URL,
+                     cache_dir: str = CACHE_DIR, offline: bool = False) -> str:
+    """ Download the archive page for a year and competitive division
+
+    Pages are cached on disk keyed by url. A cached page is revalidated with a conditional GET and reused if the
+    server answers 304 Not Modified. In offline mode only the cache is read and the network is never touched.
+
+    Args:
+        year (int): season year
+        div (str): 'club' or 'college'
+        session (requests.Session): shared session, a new one is created if not given
+        base_url (str): url template with year and div fields
+        cache_dir (str): cache directory, None disables the cache
+        offline (bool): only read pages from the cache
+
+    Returns:
+        str: page html, empty if the page is not cached in offline mode
+
+    Raises:
+        requests.RequestException: if the page is not returned with status 200, RETRY_STATUSES are retried first
+    """
+    url = base_url.format(year=year, div=div)
+
+    cached_html, cached_meta = None, {}
+    if cache_dir:
+        html_path, meta_path = _cache_paths(url, cache_dir)
+        if os.path.exists(html_path) and os.path.exists(meta_path):
+            with open(meta_path, encoding='utf-8') as f:
+                cached_meta = json.load(f)
+            with open(html_path, encoding='utf-8') as f:
+                cached_html = f.read()
+
+    if offline:
+        if cached_html is None:
+            print(f'{url} not in cache')
+            return ''
+        return cached_html
+
+    headers = {}
+    if cached_html is not None:
+        if cached_meta.get('etag'):
+            headers['If-None-Match'] = cached_meta['etag']
+        if cached_meta.get('last_modified'):
+            headers['If-Modified-Since'] = cached_meta['last_modified']
+
+    if session is None:
+        session = get_session(max_workers=1)
+    response = session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+    if response.status_code == 304 and cached_html is not None:
+        return cached_html
+    # a missing or unavailable page must not be parsed as a season without nationals
+    response.raise_for_status()
+    if response.status_code != 200:
+        raise requests.HTTPError(f'{response.status_code} response for {url}', response=response)
+
+    if cache_dir and response.status_code == 200:
+        os.makedirs(cache_dir, exist_ok=True)
+        _write_atomic(html_path, response.text)
+        _write_atomic(meta_path, json.dumps({'url': url,
+                                             'etag': response.headers.get('ETag'),
+                                             'last_modified': response.headers.get('Last-Modified')}))
+    return response.text
+
+
+def parse_archive_page(html: str, year: int, div: str, fast: bool = True) -> pd.DataFrame:
+    """ Parse the nationals results from an archive page
+
+    Args:
+        html (str): archive page html
+        year (int): season year
+        div (str): 'club' or 'college'
+        fast (bool): only build the headers and tables, with lxml if it is installed
+
+    Returns:
+        pd.DataFrame
+    """
+    if fast:
+        soup = BeautifulSoup(html, FAST_HTML_PARSER, parse_only=NATIONALS_TAGS)
+    else:
+        soup = BeautifulSoup(html, 'html.parser')
 
     # get divisions from headers
     divisions = []
@@ -155,25 +359,19 @@ def get_data_for_year(year: int, div: str) -> pd.DataFrame:
         divisions = parse_college_div(divisions)
     print(divisions)
 
-    # placement data are in tables
-    tables = soup.find_all('table', {'class': 'tablesorter'})
-
-    # assumes nationals tables are first
-    tables = tables[0:len(divisions)]
-    year_df = pd.DataFrame()
+    # placement data are in tables, assumes nationals tables are first
+    tables = soup.find_all('table', {'class': 'tablesorter'}, limit=len(divisions)) if divisions else []
+    table_dfs = []
     for i, table in enumerate(tables):
-        headings = []
-        for h in table.find_all('th'):
-            headings.append(h.text.replace("*", ""))
-        table_entries = []
-        for tr in table.find_all('tr'):
-            td = tr.find_all('td')
-            row = [tr.text for tr in td]
-            table_entries.append(row)
+        headings = [h.get_text().replace("*", "") for h in table.find_all('th')]
+        table_entries = [[td.get_text() for td in tr.find_all('td')] for tr in table.find_all('tr')]
         df_table = pd.DataFrame(table_entries, columns=headings)
         df_table['division'] = divisions[i]
-        year_df = pd.concat([year_df, df_table], sort=False)
+        table_dfs.append(df_table)
 
+    if not table_dfs:
+        return pd.DataFrame()
+    year_df = pd.concat(table_dfs, sort=False)
     if year_df.empty:
         return pd.DataFrame()
 
@@ -184,13 +382,131 @@ def get_data_for_year(year: int, div: str) -> pd.DataFrame:
     return year_df
 
 
-def region_correction(df: pd.DataFrame) -> pd.DataFrame:
+def get_data_for_year(year: int, div: str, session: requests.Session = None, base_url: str = ARCHIVE_URL,
+                      cache_dir: str = CACHE_DIR, offline: bool = False) -> pd.DataFrame:
+    html = get_archive_page(year, div, session=session, base_url=base_url, cache_dir=cache_dir, offline=offline)
+    return parse_archive_page(html, year, div)
+
+
+def _checkpoint_path(year: int, div: str, checkpoint_dir: str) -> str:
+    return os.path.join(checkpoint_dir, f'{year}_{div}.csv')
+
+
+def _get_checkpointed_data_for_year(year: int, div: str, checkpoint_dir: str = None, **kwargs) -> pd.DataFrame:
+    if not checkpoint_dir:
+        return get_data_for_year(year, div, **kwargs)
+    path = _checkpoint_path(year, div, checkpoint_dir)
+    if os.path.exists(path):
+        return read_results_csv(path)
+    year_df = get_data_for_year(year, div, **kwargs)
+    if year_df.empty and kwargs.get('offline'):
+        # the page may just not be cached yet
+        return year_df
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    with atomic_path(path) as tmp_path:
+        if year_df.empty:
+            open(tmp_path, 'w').close()
+        else:
+            year_df.to_csv(tmp_path, index=False)
+    return year_df
+
+
+def clear_checkpoints(jobs: list, checkpoint_dir: str = CHECKPOINT_DIR):
+    """ Remove checkpoints once their results have been merged into the dataset
+
+    Args:
+        jobs (list): (year, div) tuples
+        checkpoint_dir (str): checkpoint directory
+    """
+    for year, div in jobs:
+        path = _checkpoint_path(year, div, checkpoint_dir)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def iter_data_for_years(jobs: list, max_workers: int = MAX_WORKERS, base_url: str = ARCHIVE_URL,
+                        cache_dir: str = CACHE_DIR, offline: bool = False, checkpoint_dir: str = None):
+    """ Fetch and parse many archive pages concurrently over one pooled session
+
+    Only max_workers jobs are scheduled ahead of the consumer so at most that many seasons are held in memory.
+
+    Args:
+        jobs (list): (year, div) tuples
+        max_workers (int): max number of requests in flight
+        base_url (str): url template with year and div fields
+        cache_dir (str): cache directory, None disables the cache
+        offline (bool): only read pages from the cache
+        checkpoint_dir (str): if given, each result is saved here when it finishes and reused on the next run
+
+    Yields:
+        ((year, div), pd.DataFrame) in the same order as jobs
+    """
+    session = get_session(max_workers=max_workers)
+    with session, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for job in jobs:
+            pending.append((job, executor.submit(_get_checkpointed_data_for_year, *job, checkpoint_dir=checkpoint_dir,
+                                                 session=session, base_url=base_url, cache_dir=cache_dir,
+                                                 offline=offline)))
+            if len(pending) >= max_workers:
+                done_job, future = pending.popleft()
+                yield done_job, future.result()
+        while pending:
+            done_job, future = pending.popleft()
+            yield done_job, future.result()
+
+
+def correct_regions(df: pd.DataFrame) -> pd.DataFrame:
+    """ Give every row of a (comp_division, division, Team) group the Region of the group's latest year
+
+    Groups that only ever had one region are left as they are.
+
+    Args:
+        df (pd.DataFrame): results with comp_division, division, Team, Region and year columns
+
+    Returns:
+        pd.DataFrame: copy of df with corrected regions, same index and row order
+    """
+    df = df.copy()
     if df.empty:
-        return pd.DataFrame()
-    if df['Region'].nunique() > 1:
-        df = df.copy()
-        df = df.sort_values('year', ascending=False)
-        df['Region'] = df['Region'].iloc[0]
         return df
+    grouped = df.groupby(REGION_GROUP_COLUMNS, sort=False)
+    codes = grouped.ngroup().to_numpy()
+
+    # stable sort by group then latest year first, the first row of each group holds its latest region
+    order = np.lexsort((-df['year'].to_numpy(), codes))
+    sorted_codes = codes[order]
+    first_rows = order[np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]]
+    latest_region = pd.Series(df['Region'].to_numpy()[first_rows], index=codes[first_rows])
+
+    multi_region = (grouped['Region'].transform('nunique') > 1).to_numpy() & (codes >= 0)
+    df.loc[multi_region, 'Region'] = latest_region.loc[codes[multi_region]].to_numpy()
+    return df
+
+
+def merge_new_data(existing_df: pd.DataFrame, new_df: pd.DataFrame) -> pd.DataFrame:
+    """ Replace the seasons in new_df within existing_df and redo region corrections for the teams they touch
+
+    Args:
+        existing_df (pd.DataFrame): region corrected dataset
+        new_df (pd.DataFrame): newly scraped seasons, not region corrected
+
+    Returns:
+        pd.DataFrame
+    """
+    if existing_df.empty:
+        all_data = new_df.reset_index(drop=True)
     else:
-        return df
+        new_seasons = pd.MultiIndex.from_frame(new_df[['year', 'comp_division']].drop_duplicates())
+        replaced = pd.MultiIndex.from_frame(existing_df[['year', 'comp_division']]).isin(new_seasons)
+        all_data = pd.concat([existing_df[~replaced], new_df], sort=False, ignore_index=True)
+
+    all_data.year = all_data.year.astype(int)
+    all_data.Standing = all_data.Standing.astype(int)
+
+    # if team exists in later region use that one, only teams with new results can change
+    touched = pd.MultiIndex.from_frame(all_data[REGION_GROUP_COLUMNS]).isin(
+        pd.MultiIndex.from_frame(new_df[REGION_GROUP_COLUMNS].drop_duplicates()))
+    all_data.loc[touched, 'Region'] = correct_regions(all_data[touched])['Region']
+
+    return all_data.sort_values(REGION_GROUP_COLUMNS + ['year'], kind='mergesort').reset_index(drop=True)
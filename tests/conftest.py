@@ -0,0 +1,13 @@
+import os
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# archive pages saved for offline tests, named like the archive urls
+PAGES_DIR = os.path.join(ROOT_DIR, 'tests', 'pages')
+
+
+@pytest.fixture(autouse=True)
+def repo_root(monkeypatch):
+    """ Run every test from the repo root, data paths like ./data/cleaning_rules.csv are relative to it """
+    monkeypatch.chdir(ROOT_DIR)
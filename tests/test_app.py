@@ -0,0 +1,21 @@
+import pytest
+
+pytest.importorskip('dash')
+
+
+@pytest.fixture
+def app():
+    """ The dashboard, imported from the repo root since it loads ./data """
+    import app
+    return app
+
+
+def test_known_filters_are_labelled(app):
+    assert app.filter_labels('Club', 'WOMENS', 'Southwest') == \
+        {'comp_division': 'Club', 'division': 'WOMENS', 'region': 'Southwest'}
+
+
+def test_posted_filters_share_one_label(app):
+    labels = [app.filter_labels('Club', 'WOMENS', f'region {i}') for i in range(3)] + \
+        [app.filter_labels('Club', None, 'all'), app.filter_labels('<script>', 'WOMENS', 'all')]
+    assert all(label == {'comp_division': 'other', 'division': 'other', 'region': 'other'} for label in labels)
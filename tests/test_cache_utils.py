@@ -0,0 +1,81 @@
+from cache_utils import QueryCache, memoize
+
+
+class DictBackend:
+    """ Stand-in for a shared cachelib style cache like redis, kept in a dict """
+
+    def __init__(self):
+        self.entries = {}
+        self.gets = []
+
+    def get(self, key):
+        self.gets.append(key)
+        return self.entries.get(key)
+
+    def set(self, key, value):
+        self.entries[key] = value
+
+
+def test_backend_is_filled_on_miss_with_versioned_key():
+    backend = DictBackend()
+    cache = QueryCache(version='v1', backend=backend)
+    assert cache.get_or_compute(('table', 'Club'), lambda: 'computed') == 'computed'
+    assert backend.entries == {"v1:('table', 'Club')": 'computed'}
+    assert cache.stats()['misses'] == 1
+    assert cache.stats()['backend_hits'] == 0
+
+
+def test_backend_hit_is_used_by_another_worker():
+    backend = DictBackend()
+    QueryCache(version='v1', backend=backend).get_or_compute(('table', 'Club'), lambda: 'computed')
+
+    other_worker = QueryCache(version='v1', backend=backend)
+    assert other_worker.get_or_compute(('table', 'Club'), lambda: 'recomputed') == 'computed'
+    assert other_worker.stats()['backend_hits'] == 1
+    # now cached locally, the backend is not asked again
+    num_gets = len(backend.gets)
+    assert other_worker.get_or_compute(('table', 'Club'), lambda: 'recomputed') == 'computed'
+    assert len(backend.gets) == num_gets
+    assert other_worker.stats()['hits'] == 1
+
+
+def test_backend_entries_of_other_versions_are_not_used():
+    backend = DictBackend()
+    QueryCache(version='v1', backend=backend).get_or_compute(('table', 'Club'), lambda: 'old')
+
+    cache = QueryCache(version='v2', backend=backend)
+    assert cache.get_or_compute(('table', 'Club'), lambda: 'new') == 'new'
+    assert cache.stats()['backend_hits'] == 0
+    assert backend.entries["v2:('table', 'Club')"] == 'new'
+    assert backend.entries["v1:('table', 'Club')"] == 'old'
+
+
+def test_memoize_shares_results_through_backend():
+    backend = DictBackend()
+    calls = []
+
+    def make_query(cache):
+        @memoize(cache)
+        def query(division, teams=None):
+            calls.append(division)
+            return f'{division} {teams}'
+        return query
+
+    first = make_query(QueryCache(version='v1', backend=backend))
+    second = make_query(QueryCache(version='v1', backend=backend))
+    assert first('MENS', ['B', 'A']) == "MENS ['B', 'A']"
+    # team lists are keyed as sorted sets
+    assert second('MENS', teams=['A', 'B', 'A']) == "MENS ['B', 'A']"
+    assert calls == ['MENS']
+
+
+def test_lru_eviction_and_version_switch():
+    cache = QueryCache(maxsize=2, version='v1')
+    for key in ('a', 'b', 'a', 'c'):
+        cache.get_or_compute((key,), lambda: key.upper())
+    assert cache.get(('b',)) is None
+    assert cache.get(('a',)) == 'A'
+    cache.set_version('v2')
+    assert cache.stats()['size'] == 0
+    cache.set(('a',), 'stale', version='v1')
+    assert cache.get(('a',)) is None
@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from data_utils import DATA_DTYPES, atomic_path, compact_dataset, load_dataset, pa, write_arrow_dataset
+
+RESULTS = pd.DataFrame({'Standing': [1, 2, 1, 3],
+                        'Team': ['RIOT', 'FURY', 'RIOT', 'SCANDAL'],
+                        'Region': ['Northwest', 'Southwest', 'Northwest', 'Mid Atlantic'],
+                        'division': ['WOMENS'] * 4,
+                        'year': [2016, 2016, 2017, 2017],
+                        'comp_division': ['Club'] * 4,
+                        'SpiritScores': [15.5, None, 16.0, 14.25]}).astype(DATA_DTYPES)
+
+
+@pytest.mark.skipif(pa is None, reason='pyarrow is not installed')
+def test_arrow_dataset_is_not_copied(tmp_path):
+    csv_path = str(tmp_path / 'national_data.csv')
+    write_arrow_dataset(RESULTS, csv_path)
+    df = load_dataset(csv_path)
+    assert_frame_equal(df, compact_dataset(RESULTS), check_categorical=False)
+    # columns without nulls are read only views of the mapped file, a copy would be writeable
+    for column in ['Standing', 'year']:
+        assert not df[column].to_numpy().flags.writeable
+
+
+def test_csv_dataset_keeps_team_names(tmp_path):
+    csv_path = str(tmp_path / 'national_data.csv')
+    results = RESULTS.assign(Team=['NA', 'FURY', 'NA', 'null'])
+    results.to_csv(csv_path, index=False)
+    df = load_dataset(csv_path)
+    assert df['Team'].tolist() == ['NA', 'FURY', 'NA', 'null']
+    assert df['SpiritScores'].isna().tolist() == [False, True, False, False]
+
+
+def test_atomic_path_keeps_old_file_on_failure(tmp_path):
+    path = tmp_path / 'views.json'
+    path.write_text('old')
+    with pytest.raises(RuntimeError):
+        with atomic_path(str(path)) as tmp:
+            with open(tmp, 'w') as f:
+                f.write('partial')
+            raise RuntimeError('write failed')
+    assert path.read_text() == 'old'
+    assert [p.name for p in tmp_path.iterdir()] == ['views.json']
+
+    with atomic_path(str(path)) as tmp:
+        with open(tmp, 'w') as f:
+            f.write('new')
+        assert path.read_text() == 'old'
+    assert path.read_text() == 'new'
+    assert [p.name for p in tmp_path.iterdir()] == ['views.json']
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from pandas.testing import assert_frame_equal
+
+from data_utils import load_dataset
+from dynasty_utils import DynastyMetrics, longest_runs, peak_windows
+
+
+def test_longest_runs():
+    mask = np.array([[1, 1, 0, 1],
+                     [0, 1, 1, 1],
+                     [0, 0, 0, 0],
+                     [1, 0, 1, 1],
+                     [1, 1, 1, 0]], dtype=bool)
+    longest, current = longest_runs(mask)
+    assert longest.tolist() == [2, 3, 0, 2, 3]
+    assert current.tolist() == [1, 3, 0, 2, 0]
+
+
+def test_peak_windows():
+    standings = np.array([[3, 1, 2, 0, 1],  # windows with a missed nationals don't count
+                          [0, 0, 1, 0, 0],  # no complete window
+                          [1, 2, 2, 1, 2],  # ties go to the earliest window
+                          [5, 4, 3, 2, 1]], dtype=np.int16)
+    totals, ends = peak_windows(standings, window=2)
+    assert totals.tolist() == [3, 0, 3, 3]
+    assert ends.tolist() == [2, -1, 1, 4]
+
+
+def test_peak_windows_needs_enough_nationals():
+    totals, ends = peak_windows(np.ones((2, 2), dtype=np.int16), window=3)
+    assert totals.tolist() == [0, 0]
+    assert ends.tolist() == [-1, -1]
+
+
+@pytest.fixture(scope='module')
+def divisions():
+    data = load_dataset('./data/national_data.csv')
+    return [div_df for _, div_df in data.groupby(['comp_division', 'division'], observed=True)]
+
+
+@pytest.mark.parametrize('num_appended', [1, 2, 3])
+def test_appended_seasons_match_full_rebuild(divisions, num_appended):
+    for div_df in divisions:
+        years = sorted(div_df['year'].unique())
+        metrics = DynastyMetrics.from_results(div_df[div_df['year'] < years[-num_appended]])
+        for year in years[-num_appended:]:
+            metrics.append_season(int(year), div_df[div_df['year'] == year])
+        expected = DynastyMetrics.from_results(div_df)
+        assert metrics.years == expected.years
+        assert_frame_equal(metrics.leaderboard(), expected.leaderboard())
+
+
+def test_appended_season_must_be_later(divisions):
+    div_df = divisions[0]
+    metrics = DynastyMetrics.from_results(div_df)
+    with pytest.raises(ValueError):
+        metrics.append_season(metrics.years[-1], div_df[div_df['year'] == metrics.years[-1]])
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+TABLE = pd.DataFrame({'Team': ['RING', 'Ring of Fire', 'a && b', 'BRUTE SQUAD', 'Say "when"'],
+                      'Appearances': [5, 15, 1, 25, 2],
+                      'Avg Spirit Score': [5.5, np.nan, 10.0, 12.25, 8.0]})
+
+
+@pytest.fixture
+def filter_teams():
+    """ Teams of TABLE left by a filter query, the module is imported from the repo root since it loads ./data """
+    from visualize_usau_module import filter_table
+    return lambda filter_query: filter_table(TABLE, filter_query)['Team'].tolist()
+
+
+@pytest.mark.parametrize('filter_query, teams', [
+    ('{Team} = RING', ['RING']),
+    ('{Team} eq ring', []),
+    ('{Team} ieq ring', ['RING']),
+    ('{Team} ine ring', ['Ring of Fire', 'a && b', 'BRUTE SQUAD', 'Say "when"']),
+    ('{Team} contains Ring', ['Ring of Fire']),
+    ('{Team} icontains ring', ['RING', 'Ring of Fire']),
+    ('{Team} scontains RING', ['RING']),
+    ('{Team} ilt c', ['a && b', 'BRUTE SQUAD']),
+])
+def test_text_conditions(filter_teams, filter_query, teams):
+    assert filter_teams(filter_query) == teams
+
+
+@pytest.mark.parametrize('filter_query, teams', [
+    ('{Appearances} >= 15', ['Ring of Fire', 'BRUTE SQUAD']),
+    ('{Appearances} ne 5', ['Ring of Fire', 'a && b', 'BRUTE SQUAD', 'Say "when"']),
+    ('{Appearances} = 5.0', ['RING']),
+    ('{Appearances} contains 5', ['RING', 'Ring of Fire', 'BRUTE SQUAD']),
+    ('{Avg Spirit Score} < 10', ['RING', 'Say "when"']),
+    ('{Avg Spirit Score} contains 5', ['RING', 'BRUTE SQUAD']),
+    ('{Appearances} > many', []),
+])
+def test_numeric_conditions(filter_teams, filter_query, teams):
+    assert filter_teams(filter_query) == teams
+
+
+@pytest.mark.parametrize('filter_query, teams', [
+    ('{Team} = "BRUTE SQUAD"', ['BRUTE SQUAD']),
+    ('{Team} contains "a && b"', ['a && b']),
+    ("{Team} = 'a && b' && {Appearances} < 5", ['a && b']),
+    ('{Team} contains "\\"when\\""', ['Say "when"']),
+])
+def test_quoted_values(filter_teams, filter_query, teams):
+    assert filter_teams(filter_query) == teams
+
+
+@pytest.mark.parametrize('filter_query, teams', [
+    ('', list(TABLE['Team'])),
+    ('{Team} is blank', list(TABLE['Team'])),
+    ('{Coach} = RING', list(TABLE['Team'])),
+    ('{Team} icontains ring && {Appearances} > 10', ['Ring of Fire']),
+    ('{Team} icontains ring&&{Appearances} > 10', ['Ring of Fire']),
+])
+def test_combined_and_unsupported_conditions(filter_teams, filter_query, teams):
+    assert filter_teams(filter_query) == teams
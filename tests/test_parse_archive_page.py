@@ -0,0 +1,31 @@
+import os
+
+import pytest
+from pandas.testing import assert_frame_equal
+
+from conftest import PAGES_DIR
+from scrape_utils import parse_archive_page
+
+PAGES = sorted(name for name in os.listdir(PAGES_DIR) if name.endswith('.aspx'))
+
+
+def read_page(name: str) -> tuple:
+    year, div = name[:-len('.aspx')].split('_')
+    with open(os.path.join(PAGES_DIR, name), encoding='utf-8') as f:
+        return f.read(), int(year), div
+
+
+@pytest.mark.parametrize('name', PAGES)
+def test_fast_parser_matches_full_parser(name):
+    html, year, div = read_page(name)
+    fast_df = parse_archive_page(html, year, div, fast=True)
+    assert not fast_df.empty
+    assert_frame_equal(fast_df, parse_archive_page(html, year, div, fast=False))
+
+
+def test_only_nationals_tables_are_parsed():
+    html, year, div = read_page('2016_club.aspx')
+    df = parse_archive_page(html, year, div)
+    assert sorted(df.division.unique()) == ['MENS', 'MIXED', 'WOMENS']
+    assert 'REGIONAL ONLY' not in df.Team.tolist()
+    assert (df.groupby('division').size() == 16).all()
@@ -0,0 +1,142 @@
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+from pandas.testing import assert_frame_equal
+
+from conftest import PAGES_DIR
+from scrape_utils import _cache_paths, get_archive_page, iter_data_for_years, parse_archive_page
+
+JOBS = [(2016, 'club'), (2015, 'college'), (2004, 'club'), (2008, 'college')]
+
+
+class ArchiveHandler(BaseHTTPRequestHandler):
+    """ Serves saved archive pages, the first request of a page in fail_once gets a 503 and pages in etags are sent
+    with their ETag and answered with 304 when it matches If-None-Match
+    """
+
+    def do_GET(self):
+        server = self.server
+        name = self.path.lstrip('/')
+        with server.lock:
+            server.requests.append(name)
+            server.conditional.append(self.headers.get('If-None-Match'))
+            fail = name in server.fail_once
+            server.fail_once.discard(name)
+        if fail:
+            self.send_error(503)
+            return
+        path = os.path.join(PAGES_DIR, name)
+        if not os.path.exists(path):
+            self.send_error(404)
+            return
+        etag = server.etags.get(name)
+        if etag is not None and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        # earlier jobs answer last so results complete out of job order
+        time.sleep(server.delays.get(name, 0))
+        with open(path, 'rb') as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if etag is not None:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def archive_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ArchiveHandler)
+    server.lock = threading.Lock()
+    server.requests = []
+    server.conditional = []
+    server.etags = {}
+    server.fail_once = set()
+    server.delays = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def base_url(server) -> str:
+    return f'http://127.0.0.1:{server.server_address[1]}/{{year}}_{{div}}.aspx'
+
+
+def expected_data(year: int, div: str):
+    with open(os.path.join(PAGES_DIR, f'{year}_{div}.aspx'), encoding='utf-8') as f:
+        return parse_archive_page(f.read(), year, div)
+
+
+def test_results_come_back_in_job_order(archive_server):
+    archive_server.delays = {f'{year}_{div}.aspx': 0.05 * (len(JOBS) - i) for i, (year, div) in enumerate(JOBS)}
+    results = list(iter_data_for_years(JOBS, max_workers=4, base_url=base_url(archive_server), cache_dir=None))
+    assert [job for job, _ in results] == JOBS
+    for (year, div), year_df in results:
+        assert_frame_equal(year_df, expected_data(year, div))
+
+
+def test_unavailable_page_is_retried(archive_server):
+    archive_server.fail_once = {'2015_college.aspx'}
+    results = dict(iter_data_for_years(JOBS, max_workers=2, base_url=base_url(archive_server), cache_dir=None))
+    assert archive_server.requests.count('2015_college.aspx') == 2
+    assert_frame_equal(results[(2015, 'college')], expected_data(2015, 'college'))
+
+
+def test_pages_are_cached(archive_server, tmp_path):
+    url = base_url(archive_server)
+    first = list(iter_data_for_years(JOBS, base_url=url, cache_dir=str(tmp_path)))
+    offline = list(iter_data_for_years(JOBS, base_url=url, cache_dir=str(tmp_path), offline=True))
+    assert len(archive_server.requests) == len(JOBS)
+    for (job, year_df), (offline_job, offline_df) in zip(first, offline):
+        assert job == offline_job
+        assert_frame_equal(year_df, offline_df)
+
+
+def test_unchanged_page_is_revalidated(archive_server, tmp_path):
+    archive_server.etags = {'2016_club.aspx': '"v1"'}
+    url = base_url(archive_server)
+    html_path, _ = _cache_paths(url.format(year=2016, div='club'), str(tmp_path))
+    page = get_archive_page(2016, 'club', base_url=url, cache_dir=str(tmp_path))
+    with open(html_path, encoding='utf-8') as f:
+        assert f.read() == page
+
+    # the server answers 304 without a body, the page comes from the cache
+    with open(html_path, 'w', encoding='utf-8') as f:
+        f.write('cached page')
+    assert get_archive_page(2016, 'club', base_url=url, cache_dir=str(tmp_path)) == 'cached page'
+
+    # a changed page is downloaded again and replaces the cached one
+    archive_server.etags = {'2016_club.aspx': '"v2"'}
+    assert get_archive_page(2016, 'club', base_url=url, cache_dir=str(tmp_path)) == page
+    assert get_archive_page(2016, 'club', base_url=url, cache_dir=str(tmp_path)) == page
+    assert archive_server.conditional == [None, '"v1"', '"v1"', '"v2"']
+
+
+def test_missing_page_is_not_checkpointed_as_empty(archive_server, tmp_path):
+    jobs = [(2016, 'club'), (2017, 'club')]
+    with pytest.raises(requests.HTTPError):
+        list(iter_data_for_years(jobs, base_url=base_url(archive_server), cache_dir=None,
+                                 checkpoint_dir=str(tmp_path)))
+    assert os.listdir(str(tmp_path)) == ['2016_club.csv']
+
+
+def test_uncached_page_is_not_checkpointed_offline(archive_server, tmp_path):
+    checkpoint_dir = tmp_path / 'checkpoints'
+    results = list(iter_data_for_years(JOBS[:1], base_url=base_url(archive_server), cache_dir=str(tmp_path / 'cache'),
+                                       offline=True, checkpoint_dir=str(checkpoint_dir)))
+    assert results[0][1].empty
+    assert not archive_server.requests
+    assert not checkpoint_dir.exists()
@@ -0,0 +1,35 @@
+import pandas as pd
+import pytest
+
+import scrape_usau_module
+from scrape_usau_module import get_jobs, load_empty_seasons, save_empty_seasons
+
+EXISTING = pd.DataFrame({'year': [1984, 1984, 1985], 'comp_division': ['Club', 'College', 'Club'],
+                         'Team': ['A', 'B', 'C'], 'Standing': [1, 1, 1]})
+
+
+@pytest.fixture(autouse=True)
+def seasons(monkeypatch):
+    monkeypatch.setattr(scrape_usau_module, 'start_year', 1983)
+    monkeypatch.setattr(scrape_usau_module, 'end_year', 1986)
+
+
+def test_get_jobs_skips_done_seasons():
+    assert get_jobs(EXISTING) == [(1983, 'club'), (1983, 'college'), (1985, 'college'), (1986, 'club'),
+                                  (1986, 'college')]
+
+
+def test_get_jobs_skips_empty_seasons(tmp_path):
+    path = str(tmp_path / 'empty_seasons.csv')
+    save_empty_seasons({(1983, 'college'), (1985, 'college')}, path)
+    assert get_jobs(EXISTING, empty_seasons=load_empty_seasons(path)) == [(1983, 'club'), (1986, 'club'),
+                                                                          (1986, 'college')]
+
+
+def test_get_jobs_of_new_dataset():
+    assert len(get_jobs(pd.DataFrame())) == 8
+
+
+def test_get_jobs_of_given_years_rescrapes_them():
+    assert get_jobs(EXISTING, years=[1984], empty_seasons={(1984, 'college')}) == [(1984, 'club'),
+                                                                                   (1984, 'college')]
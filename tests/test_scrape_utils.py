@@ -0,0 +1,105 @@
+import pandas as pd
+from pandas.testing import assert_frame_equal, assert_series_equal
+
+from scrape_utils import apply_cleaning_rules, correct_regions, load_cleaning_rules, merge_new_data
+
+# raw scraped results, teams keep their region within a season but some moved between seasons
+RESULTS = pd.DataFrame([
+    ('Club', 'MENS', 'RHINO', 'Northwest', 2010, 3),
+    ('Club', 'MENS', 'RHINO', 'Northwest', 2011, 5),
+    ('Club', 'MENS', 'RHINO', 'Southwest', 2013, 2),
+    ('Club', 'MENS', 'RHINO', 'Central', 2012, 7),
+    ('Club', 'MIXED', 'RHINO', 'Northwest', 2012, 1),
+    ('Club', 'MENS', 'SOCKEYE', 'Northwest', 2010, 1),
+    ('Club', 'MENS', 'SOCKEYE', 'Northwest', 2013, 4),
+    ('Club', 'MENS', 'GHOST', 'New England', 2011, 8),
+    ('College', "D-I Men's", 'Oregon', 'Northwest', 2010, 6),
+    ('College', "D-I Men's", 'Oregon', 'Great Lakes', 2012, 2),
+    ('College', "D-I Men's", 'Oregon', 'Southwest', 2011, 9),
+], columns=['comp_division', 'division', 'Team', 'Region', 'year', 'Standing'])
+
+# rules scoped by competitive division and year, region rules matched on teams come after the team rules
+RULES_CSV = """column,match_column,old,new,div,min_year,max_year
+Team,Team,RINHO,RHINO,all,,
+Region,Team,RHINO,Northwest,club,,2012
+Region,Region,Sothwest,Southwest,all,2005,
+Region,Region,Southwest,Southwest (pre-2010),college,,2009
+Region,Region,Central,Southwest,club,2011,2011
+"""
+
+
+def region_correction(df: pd.DataFrame) -> pd.DataFrame:
+    """ Region correction of one team before correct_regions, applied per group """
+    if df['Region'].nunique() > 1:
+        df = df.copy()
+        df = df.sort_values('year', ascending=False)
+        df['Region'] = df['Region'].iloc[0]
+    return df
+
+
+def test_correct_regions_matches_groupwise_correction():
+    df = RESULTS.sample(frac=1, random_state=0)
+    expected = df.groupby(['comp_division', 'division', 'Team'], group_keys=False).apply(region_correction)
+    corrected = correct_regions(df)
+    assert_frame_equal(corrected.drop(columns='Region'), df.drop(columns='Region'))
+    assert_series_equal(corrected['Region'], expected['Region'].loc[df.index])
+    assert corrected.loc[(corrected['Team'] == 'RHINO') & (corrected['division'] == 'MENS'), 'Region'].eq(
+        'Southwest').all()
+    assert corrected.loc[corrected['Team'] == 'Oregon', 'Region'].eq('Great Lakes').all()
+
+
+def test_correct_regions_keeps_input():
+    df = RESULTS.copy()
+    correct_regions(df)
+    assert_frame_equal(df, RESULTS)
+    assert correct_regions(RESULTS.iloc[0:0]).empty
+
+
+def test_merge_new_data_matches_full_build():
+    full = merge_new_data(pd.DataFrame(), RESULTS)
+    existing = merge_new_data(pd.DataFrame(), RESULTS[RESULTS['year'] < 2012])
+    incremental = merge_new_data(merge_new_data(existing, RESULTS[RESULTS['year'] == 2012]),
+                                 RESULTS[RESULTS['year'] == 2013])
+    assert_frame_equal(incremental, full)
+
+
+def test_merge_new_data_replaces_rescraped_seasons():
+    full = merge_new_data(pd.DataFrame(), RESULTS)
+    # a rescraped club season replaces every club result of that year and leaves college alone
+    rescraped = RESULTS[(RESULTS['year'] == 2012) & (RESULTS['comp_division'] == 'Club')].assign(Standing=10)
+    merged = merge_new_data(full, rescraped)
+    assert_frame_equal(merged, merge_new_data(pd.DataFrame(), pd.concat([RESULTS.drop(rescraped.index), rescraped])))
+    assert (merged.loc[(merged['year'] == 2012) & (merged['comp_division'] == 'Club'), 'Standing'] == 10).all()
+    assert len(merged) == len(full)
+
+
+def test_cleaning_rules_are_scoped_by_division_and_years(tmp_path):
+    path = tmp_path / 'cleaning_rules.csv'
+    path.write_text(RULES_CSV)
+    rules = load_cleaning_rules(str(path))
+
+    def cleaned_regions(div: str, year: int) -> list:
+        df = pd.DataFrame({'Team': ['RINHO', 'SOCKEYE', 'FURY', 'Texas'],
+                           'Region': ['Central', 'Central', 'Sothwest', 'Southwest']})
+        return apply_cleaning_rules(df, rules, div, year)['Region'].tolist()
+
+    # RHINO's region is set from its corrected name before the Central rule could match it
+    assert cleaned_regions('club', 2011) == ['Northwest', 'Southwest', 'Southwest', 'Southwest']
+    assert cleaned_regions('club', 2012) == ['Northwest', 'Central', 'Southwest', 'Southwest']
+    assert cleaned_regions('club', 2013) == ['Central', 'Central', 'Southwest', 'Southwest']
+    assert cleaned_regions('club', 2004) == ['Northwest', 'Central', 'Sothwest', 'Southwest']
+    # chains only follow the rules in scope
+    assert cleaned_regions('college', 2008) == ['Central', 'Central', 'Southwest (pre-2010)', 'Southwest (pre-2010)']
+    assert cleaned_regions('college', 2010) == ['Central', 'Central', 'Southwest', 'Southwest']
+
+
+def test_cleaning_rule_chains_are_resolved():
+    rules = load_cleaning_rules()
+    df = pd.DataFrame({'Team': ['A', 'B', 'C'], 'Region': ['Mid-Atlantic', 'Mid Atlantic', 'New England '],
+                       'division': ['College Championships: Open Division', "D-I Open", "Women's"]})
+    college = apply_cleaning_rules(df.copy(), rules, 'college', 1995)
+    assert college['Region'].tolist() == ['Mid Atlantic (pre-1999)', 'Mid Atlantic (pre-1999)', 'New England']
+    assert college['division'].tolist() == ["Men's (pre-2010)", "D-I Men's", "Women's (pre-2010)"]
+    club = apply_cleaning_rules(df.copy(), rules, 'club', 1995)
+    assert club['Region'].tolist() == ['Mid Atlantic', 'Mid Atlantic', 'New England']
+    assert club['division'].tolist() == ["Men's", "D-I Men's", "Women's"]
@@ -0,0 +1,47 @@
+import pytest
+from pandas.testing import assert_frame_equal
+
+from data_utils import DATA_DTYPES, SqliteDataset, get_sqlite_path, write_sqlite_dataset
+
+# SQLite and pandas sum the averages in a different order
+AVERAGE_RTOL = 1e-9
+
+
+@pytest.fixture
+def vis():
+    """ The dashboard queries on the in memory dataset, imported from the repo root since they load ./data """
+    import visualize_usau_module
+    assert visualize_usau_module.DATABASE is None
+    return visualize_usau_module
+
+
+@pytest.fixture
+def database(vis, tmp_path):
+    csv_path = str(tmp_path / 'national_data.csv')
+    write_sqlite_dataset(vis.data, csv_path)
+    return SqliteDataset(get_sqlite_path(csv_path))
+
+
+def test_version_matches(vis, database):
+    assert database.version == vis.DATA_VERSION
+
+
+def test_divisions_and_regions_match(vis, database):
+    assert database.comp_divisions() == list(vis.COMP_DIVISIONS)
+    for comp_division in vis.COMP_DIVISIONS:
+        comp_df = vis.data[vis.data.comp_division == comp_division]
+        assert database.divisions(comp_division) == list(comp_df.division.unique())
+        for division in database.divisions(comp_division):
+            assert database.regions(comp_division, division) == \
+                list(vis.subset_df(comp_division, division, 'all').Region.unique())
+
+
+def test_subsets_match(vis, database):
+    for filters in vis.iter_filters():
+        expected = vis.subset_df(*filters).astype(DATA_DTYPES).reset_index(drop=True)
+        assert_frame_equal(database.subset(*filters), expected)
+
+
+def test_team_summaries_match(vis, database):
+    for filters in vis.iter_filters():
+        assert_frame_equal(database.team_summary(*filters), vis.team_summary(*filters), rtol=AVERAGE_RTOL)
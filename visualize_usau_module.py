@@ -1,13 +1,74 @@
+import hashlib
+import json
 import math
+import os
+import re
+import time
+from collections import OrderedDict
+
+import plotly
 import plotly.graph_objects as go
+from plotly.utils import PlotlyJSONEncoder
 import pandas as pd
 import numpy as np
+import dash_constants
 from dash_constants import BACKGROUND_COLOR_DARK, BACKGROUND_COLOR_LIGHT, PLOT_BACKGROUND_COLOR, AXIS_TITLE_SIZE, \
-    TICK_SIZE
+    TICK_SIZE, WEBGL_MIN_TEAMS, TABLE_PAGE_SIZE, INITIAL_NUM_CHECKED
+from data_utils import DATA_DTYPES, DATA_PATH, SqliteDataset, atomic_path, compact_dataset, dataset_version, \
+    get_sqlite_path, load_dataset
+from cache_utils import QueryCache, memoize
+from dynasty_utils import DynastyMetrics
+from metrics_utils import METRICS
+
+# table and graph data of every filter combination, built by the scrape and committed with the dataset, views built
+# from another dataset or by other code (including other pandas or plotly versions) are ignored
+VIEWS_PATH = './data/national_views.json'
+
+# 'pandas' keeps the dataset in every worker's memory, 'sqlite' queries the indexed copy built by the scrape
+# pipeline so memory per worker doesn't grow with the dataset
+QUERY_BACKEND = 'pandas'
+
+# seconds spent on each startup stage, reported when the app is loaded
+STARTUP_TIMES = OrderedDict()
+_stage_start = time.perf_counter()
+
+if QUERY_BACKEND == 'sqlite' and os.path.exists(get_sqlite_path(DATA_PATH)):
+    DATABASE = SqliteDataset(get_sqlite_path(DATA_PATH))
+    data = None
+else:
+    DATABASE = None
+    data = load_dataset()
+STARTUP_TIMES['load dataset'] = time.perf_counter() - _stage_start
 
-data = pd.read_csv('./data/national_data.csv')
+# query results are cached per worker and invalidated when the dataset changes
+DATA_VERSION = DATABASE.version if DATABASE is not None else dataset_version(data)
+QUERY_CACHE = QueryCache(version=DATA_VERSION)
 
-COMP_DIVISIONS = data.comp_division.unique()
+COMP_DIVISIONS = DATABASE.comp_divisions() if DATABASE is not None else data.comp_division.unique()
+
+
+def build_subset_index(df: pd.DataFrame) -> dict:
+    """ Split results df once into every (competitive division, sub division, region) subset
+
+    Args:
+        df (pd.DataFrame): all results
+
+    Returns:
+        dict: (comp_division, division, region) -> pd.DataFrame, region 'all' for every region
+    """
+    subsets = {}
+    divisions = df.groupby(['comp_division', 'division'], observed=True).indices
+    for (comp_division, division), positions in divisions.items():
+        subsets[(comp_division, division, 'all')] = df.iloc[positions]
+    for key, positions in df.groupby(['comp_division', 'division', 'Region'], observed=True).indices.items():
+        subsets[key] = df.iloc[positions]
+    return subsets
+
+
+_stage_start = time.perf_counter()
+SUBSETS = build_subset_index(data) if data is not None else {}
+EMPTY_SUBSET = data.iloc[0:0] if data is not None else None
+STARTUP_TIMES['build subset index'] = time.perf_counter() - _stage_start
 
 
 def ordinal(n: float) -> str:
@@ -56,6 +117,7 @@ def get_blank_plot(message: str) -> dict:
         }
 
 
+@memoize(QUERY_CACHE)
 def get_divisions(comp_division: str) -> list:
     """ Get list of gendered sub divisions from competitive division
 
@@ -66,12 +128,16 @@ def get_divisions(comp_division: str) -> list:
         list
 
     """
-    divisions = data[data.comp_division == comp_division].division.unique()
+    if DATABASE is not None:
+        divisions = DATABASE.divisions(comp_division)
+    else:
+        divisions = data[data.comp_division == comp_division].division.unique()
     division_list = list(divisions)
     division_list.sort(key=lambda x: x[-1], reverse=True)
     return [{'label': d, 'value': d} for d in division_list]
 
 
+@memoize(QUERY_CACHE)
 def get_regions(comp_division: str, division: str) -> list:
     """ Get list of regions from competitive division and sub division name
 
@@ -82,15 +148,22 @@ def get_regions(comp_division: str, division: str) -> list:
     Returns:
         list
     """
-    regions = subset_df(comp_division, division, 'all').Region.unique()
+    if DATABASE is not None:
+        regions = DATABASE.regions(comp_division, division)
+    else:
+        regions = subset_df(comp_division, division, 'all').Region.unique()
     region_list = list(regions)
     region_list.sort(key=lambda x: x[-1], reverse=True)
     return [{'label': 'All Regions', 'value': 'all'}] + [{'label': r, 'value': r} for r in region_list]
 
 
+@METRICS.timed_stage('subset')
 def subset_df(comp_division: str, division: str, region: str) -> pd.DataFrame:
     """ Subset all results df using subset parameters
 
+    Subsets are precomputed at load time, or queried from the SQLite copy, and shared between calls so they must
+    not be modified in place.
+
     Args:
         comp_division (str): competitive division name
         division (str): gendered sub division name
@@ -99,14 +172,53 @@ def subset_df(comp_division: str, division: str, region: str) -> pd.DataFrame:
     Returns:
         pd.DataFrame
     """
-    if region == 'all':
-        div_df = data[(data.comp_division == comp_division) & (data.division == division)].copy()
-    else:
-        div_df = data[
-            (data.comp_division == comp_division) & (data.division == division) & (data.Region == region)].copy()
-    return div_df
+    if DATABASE is not None:
+        return DATABASE.subset(comp_division, division, region)
+    return SUBSETS.get((comp_division, division, region), EMPTY_SUBSET)
+
+
+def decode_teams(div_df: pd.DataFrame) -> pd.DataFrame:
+    """ Get subset with team names as plain strings, pivots and reindexes on them are much faster than on a
+    categorical of every team in the dataset
+
+    Args:
+        div_df (pd.DataFrame): subset from subset_df
+
+    Returns:
+        pd.DataFrame
+    """
+    if not isinstance(div_df['Team'].dtype, pd.CategoricalDtype):
+        return div_df
+    return div_df.assign(Team=div_df['Team'].astype(object))
+
+
+@memoize(QUERY_CACHE)
+@METRICS.timed_stage('aggregate')
+def team_summary(comp_division: str, division: str, region: str = 'all') -> pd.DataFrame:
+    """ Get appearances, average placement and average spirit score per team, shared by the table and graphs
+
+    Args:
+        comp_division (str): competitive division name
+        division (str): gendered sub division name
+        region (str): region name
+
+    Returns:
+        pd.DataFrame
+    """
+    if DATABASE is not None:
+        return DATABASE.team_summary(comp_division, division, region)
+    div_df = subset_df(comp_division, division, region)
+    # group on the integer team codes, categories are sorted so groups come out in team name order
+    teams = div_df['Team'].cat
+    summary = div_df.groupby(teams.codes.to_numpy()).agg(count=('year', 'count'),
+                                                         avg_rank=('Standing', 'mean'),
+                                                         avg_spirit=('SpiritScores', np.nanmean))
+    summary.insert(0, 'Team', teams.categories.to_numpy()[summary.index.to_numpy()])
+    return summary.reset_index(drop=True)
 
 
+@memoize(QUERY_CACHE)
+@METRICS.timed_stage('aggregate')
 def table_data(comp_division: str, division: str, region: str = 'all') -> pd.DataFrame:
     """ Get summary table from subset parameters
 
@@ -118,76 +230,197 @@ def table_data(comp_division: str, division: str, region: str = 'all') -> pd.Dat
     Returns:
         pd.DataFrame
     """
-    div_df = subset_df(comp_division, division, region)
-    if div_df.empty:
+    table_df = team_summary(comp_division, division, region)
+    if table_df.empty:
         return pd.DataFrame()
-    table_df = div_df.groupby(['Team']).agg(num_appearances=('year', 'count'),
-                                            avg_place=('Standing', 'mean'),
-                                            avg_spirit=('SpiritScores', np.nanmean)).reset_index()
     table_df = table_df.round(2)
-    table_df = table_df.sort_values('num_appearances', ascending=False)
-    table_df = table_df.rename(columns={'num_appearances': 'Appearances',
-                                        'avg_place': 'Avg Placement',
+    table_df = table_df.sort_values('count', ascending=False)
+    table_df = table_df.rename(columns={'count': 'Appearances',
+                                        'avg_rank': 'Avg Placement',
                                         'avg_spirit': 'Avg Spirit Score'})
     return table_df
 
 
-def ranking_data(comp_division: str, division: str, region: str = 'all', highlight_teams: list = None) -> dict:
-    """ Prepare placement scatter plot
+@memoize(QUERY_CACHE)
+@METRICS.timed_stage('aggregate')
+def table_records(comp_division: str, division: str, region: str = 'all') -> list:
+    """ Get summary table rows as records for the dash table
 
     Args:
         comp_division (str): competitive division name
         division (str): gendered sub division name
         region (str): region name
-        highlight_teams (list): list of teams to highlight
 
     Returns:
-        dict
+        list
     """
+    return table_data(comp_division, division, region).to_dict('records')
 
-    div_df = subset_df(comp_division, division, region)
-    if highlight_teams is None:
-        highlight_teams = div_df.Team.tolist()
-    if div_df.empty:
-        return get_blank_plot('No data found')
-    min_year = div_df.year.min()
-    max_year = div_df.year.max()
-    max_standing = div_df['Standing'].max()
 
-    def add_custom_data(df: pd.DataFrame) -> pd.DataFrame:
-        teams = df['Team'].unique()
-        hover_text = '<br>'.join(f'<b>Team: {team}</b>' for team in teams if team in highlight_teams)
-        df['overlap_teams'] = hover_text
-        return df
+# one condition of a DataTable filter query, e.g. {Team} contains "RING" or {Appearances} >= 5
+FILTER_CONDITION = re.compile(r'^\{(?P<column>[^}]+)\}\s+(?P<operator>[si]?(?:eq|ne|lt|le|gt|ge|contains)|[<>=!]=?)'
+                              r'\s+(?P<value>.+)$')
+FILTER_OPERATORS = {'=': 'eq', '!=': 'ne', '<': 'lt', '<=': 'le', '>': 'gt', '>=': 'ge'}
+# conditions are joined by &&, which can also appear inside a quoted value
+FILTER_PART = re.compile(r'(?:"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|`(?:\\.|[^`\\])*`|[^"\'`&]|(?<!&)&(?!&)|["\'`])+')
 
-    # add teams with same place/year for hover info
-    div_df = div_df.groupby(['year', 'Standing']).apply(add_custom_data)
 
-    plot_data = []
-    for t in div_df['Team'].unique():
-        if t in highlight_teams:
-            opacity = 1
-            hover_template = '%{customdata}' \
-                             '<br>Year: %{x}<br>Placement: %{y}<extra></extra>'
-        else:
-            opacity = 0.05
-            hover_template = ''
-        team_df = div_df[div_df.Team == t].copy()
-        team_df.set_index('year', inplace=True)
-        team_df = team_df.reindex(list(range(min_year, max_year + 1)), fill_value=None)
-        plot_data.append(go.Scatter(x=team_df.index,
-                                    y=team_df['Standing'],
-                                    hoverinfo='skip',
-                                    customdata=team_df['overlap_teams'],
-                                    hovertemplate=hover_template,
-                                    mode='lines+markers',
-                                    connectgaps=False,
-                                    opacity=opacity,
-                                    line={'shape': 'linear'},
-                                    marker={'size': 18},
-                                    showlegend=False,
-                                    name=t))
+def filter_table(table_df: pd.DataFrame, filter_query: str) -> pd.DataFrame:
+    """ Filter summary table rows with a DataTable filter query, unsupported conditions are ignored
+
+    Args:
+        table_df (pd.DataFrame): summary table
+        filter_query (str): conditions joined by &&
+
+    Returns:
+        pd.DataFrame
+    """
+    keep = pd.Series(True, index=table_df.index)
+    for condition in FILTER_PART.findall(filter_query or ''):
+        match = FILTER_CONDITION.match(condition.strip())
+        if match is None or match['column'] not in table_df.columns:
+            continue
+        column = table_df[match['column']]
+        operator = FILTER_OPERATORS.get(match['operator'], match['operator'])
+        case_sensitive = not operator.startswith('i')
+        operator = operator.lstrip('si')
+        value = match['value'].strip()
+        quoted = value[:1] in '"\'`' and value[-1:] == value[:1] and len(value) > 1
+        if quoted:
+            value = re.sub(r'\\(.)', r'\1', value[1:-1])
+        if operator == 'contains':
+            # numbers are matched as typed, e.g. 5 matches 5, 15 and 5.5
+            keep &= column.astype(str).str.contains(value, case=case_sensitive, regex=False)
+            continue
+        if column.dtype.kind in 'if':
+            try:
+                value = float(value)
+            except ValueError:
+                keep &= False
+                continue
+        elif not case_sensitive:
+            column = column.astype(str).str.lower()
+            value = value.lower()
+        keep &= getattr(column, operator)(value)
+    return table_df[keep]
+
+
+@memoize(QUERY_CACHE)
+@METRICS.timed_stage('aggregate')
+def sorted_table(comp_division: str, division: str, region: str = 'all', sort_column: str = None,
+                 ascending: bool = True, filter_query: str = '') -> pd.DataFrame:
+    """ Get summary table sorted by a column and filtered, ties and missing values keep the default order at the end
+
+    Args:
+        comp_division (str): competitive division name
+        division (str): gendered sub division name
+        region (str): region name
+        sort_column (str): column to sort by, None for the default order
+        ascending (bool): sort direction
+        filter_query (str): DataTable filter query
+
+    Returns:
+        pd.DataFrame
+    """
+    table_df = table_data(comp_division, division, region)
+    if table_df.empty:
+        return table_df
+    if sort_column in table_df.columns:
+        table_df = table_df.sort_values(sort_column, ascending=ascending, kind='mergesort', na_position='last')
+    return filter_table(table_df, filter_query).reset_index(drop=True)
+
+
+def table_page(comp_division: str, division: str, region: str = 'all', page_current: int = 0,
+               page_size: int = TABLE_PAGE_SIZE, sort_column: str = None, ascending: bool = True,
+               filter_query: str = '') -> tuple:
+    """ Get one page of the sorted and filtered summary table
+
+    Args:
+        comp_division (str): competitive division name
+        division (str): gendered sub division name
+        region (str): region name
+        page_current (int): page number, from 0
+        page_size (int): rows per page
+        sort_column (str): column to sort by, None for the default order
+        ascending (bool): sort direction
+        filter_query (str): DataTable filter query
+
+    Returns:
+        tuple: (page records, page count)
+    """
+    table_df = sorted_table(comp_division, division, region, sort_column, ascending, filter_query)
+    page_count = max(math.ceil(len(table_df) / page_size), 1)
+    start = page_current * page_size
+    return table_df.iloc[start:start + page_size].to_dict('records'), page_count
+
+
+def default_teams(comp_division: str, division: str, region: str = 'all', n_clicks: int = 0) -> list:
+    """ Get the teams selected after changing filters (the first few) or pressing select/un-select all
+
+    Args:
+        comp_division (str): competitive division name
+        division (str): gendered sub division name
+        region (str): region name
+        n_clicks (int): times select/un-select all was pressed since the filters changed
+
+    Returns:
+        list
+    """
+    table_df = table_data(comp_division, division, region)
+    if table_df.empty:
+        return []
+    if not n_clicks:
+        return table_df.Team[:INITIAL_NUM_CHECKED].tolist()
+    elif n_clicks % 2 == 0:
+        return []
+    return table_df.Team.tolist()
+
+
+def build_dynasties() -> dict:
+    """ Compute the dynasty metrics of every division
+
+    Returns:
+        dict: (comp_division, division) -> DynastyMetrics
+    """
+    return {(comp_division, division['value']): DynastyMetrics.from_results(
+                subset_df(comp_division, division['value'], 'all'))
+            for comp_division in COMP_DIVISIONS for division in get_divisions(comp_division)}
+
+
+@memoize(QUERY_CACHE)
+@METRICS.timed_stage('aggregate')
+def dynasty_records(comp_division: str, division: str, region: str = 'all') -> list:
+    """ Get dynasty leaderboard rows of the teams in a subset as records for the dash table
 
+    Metrics are over all nationals of the division, the region only picks the teams.
+
+    Args:
+        comp_division (str): competitive division name
+        division (str): gendered sub division name
+        region (str): region name
+
+    Returns:
+        list
+    """
+    dynasties = DYNASTIES.get((comp_division, division))
+    if dynasties is None:
+        return []
+    teams = None if region == 'all' else subset_df(comp_division, division, region)['Team'].unique()
+    return dynasties.leaderboard(teams).to_dict('records')
+
+
+def ranking_layout(div_df: pd.DataFrame) -> dict:
+    """ Get placement scatter plot layout for a subset
+
+    Args:
+        div_df (pd.DataFrame): subset results
+
+    Returns:
+        dict
+    """
+    min_year = div_df.year.min()
+    max_year = div_df.year.max()
+    max_standing = div_df['Standing'].max()
     tickvals = list(reversed(range(1, max_standing + 1)))
     ticktext = [ordinal(n) for n in tickvals]
     extra_space = 0.5 if (max_year - min_year) > 15 else 0.2
@@ -205,9 +438,154 @@ def ranking_data(comp_division: str, division: str, region: str = 'all', highlig
                         'title': {'text': 'Nationals Placement', 'font': {'size': AXIS_TITLE_SIZE}},
                         'tickmode': 'array', 'tickvals': tickvals, 'ticktext': ticktext,
                         }}
+    return layout
+
+
+@memoize(QUERY_CACHE)
+@METRICS.timed_stage('figure')
+def ranking_data(comp_division: str, division: str, region: str = 'all', highlight_teams: list = None,
+                 compact: bool = False, webgl: bool = False) -> dict:
+    """ Prepare placement scatter plot
+
+    Args:
+        comp_division (str): competitive division name
+        division (str): gendered sub division name
+        region (str): region name
+        highlight_teams (list): list of teams to highlight
+        compact (bool): draw all teams that are not highlighted as one trace
+        webgl (bool): render with WebGL (Scattergl) instead of SVG
+
+    Returns:
+        dict
+    """
+
+    div_df = decode_teams(subset_df(comp_division, division, region))
+    if highlight_teams is None:
+        highlight_teams = div_df.Team.tolist()
+    if div_df.empty:
+        return get_blank_plot('No data found')
+    min_year = div_df.year.min()
+    max_year = div_df.year.max()
+
+    highlight_set = set(highlight_teams)
+    years = list(range(min_year, max_year + 1))
+
+    # add highlighted teams with same place/year for hover info
+    is_highlighted = div_df['Team'].isin(highlight_set)
+    overlap = div_df[is_highlighted].drop_duplicates(['year', 'Standing', 'Team'])
+    overlap_text = ('<b>Team: ' + overlap['Team'] + '</b>').groupby([overlap['year'], overlap['Standing']],
+                                                                     sort=False).agg('<br>'.join)
+    overlap_teams = pd.Series(pd.MultiIndex.from_arrays([div_df['year'], div_df['Standing']]).map(overlap_text),
+                              index=div_df.index).fillna('')
+
+    # year x team matrices of placements and hover text, teams ordered by first year and placement
+    teams = div_df.sort_values(['year', 'Standing'], kind='mergesort')['Team'].unique()
+    standings = div_df.pivot(index='year', columns='Team', values='Standing').reindex(index=years, columns=teams)
+    custom_data = div_df.assign(overlap_teams=overlap_teams).pivot(index='year', columns='Team',
+                                                                   values='overlap_teams').reindex(index=years,
+                                                                                                   columns=teams)
+    # teams at every nationals in the range keep integer placements
+    complete_teams = set(standings.columns[standings.notna().all().to_numpy()])
+
+    scatter = go.Scattergl if webgl else go.Scatter
+    plot_data = []
+    if compact and not is_highlighted.all():
+        # one line per team in a single trace, with a gap between teams and between non consecutive years
+        faded = div_df[~is_highlighted]
+        team_codes = pd.Categorical(faded['Team'], categories=teams).codes
+        order = np.lexsort((faded['year'].to_numpy(), team_codes))
+        faded_codes = team_codes[order]
+        faded_years = faded['year'].to_numpy()[order]
+        gaps = np.flatnonzero((faded_codes[1:] != faded_codes[:-1]) | (faded_years[1:] != faded_years[:-1] + 1)) + 1
+        plot_data.append(scatter(x=np.insert(faded_years.astype(object), gaps, None),
+                                 y=np.insert(faded['Standing'].to_numpy()[order].astype(object), gaps, None),
+                                 hoverinfo='skip',
+                                 hovertemplate='',
+                                 mode='lines+markers',
+                                 connectgaps=False,
+                                 opacity=0.05,
+                                 line={'shape': 'linear'},
+                                 marker={'size': 18},
+                                 showlegend=False,
+                                 name='Other teams'))
+
+    for t in teams:
+        if compact and t not in highlight_set:
+            continue
+        if t in highlight_set:
+            opacity = 1
+            hover_template = '%{customdata}' \
+                             '<br>Year: %{x}<br>Placement: %{y}<extra></extra>'
+        else:
+            opacity = 0.05
+            hover_template = ''
+        team_standings = standings[t]
+        if t in complete_teams:
+            team_standings = team_standings.astype(div_df['Standing'].dtype)
+        plot_data.append(scatter(x=standings.index,
+                                 y=team_standings,
+                                 hoverinfo='skip',
+                                 customdata=custom_data[t],
+                                 hovertemplate=hover_template,
+                                 mode='lines+markers',
+                                 connectgaps=False,
+                                 opacity=opacity,
+                                 line={'shape': 'linear'},
+                                 marker={'size': 18},
+                                 showlegend=False,
+                                 name=t))
+
+    layout = ranking_layout(div_df)
     return dict(data=plot_data, layout=layout)
 
 
+def spirit_hovertext(agg_team: pd.DataFrame) -> np.ndarray:
+    """ Get spirit scatter plot hover text per team
+
+    Args:
+        agg_team (pd.DataFrame): output of team_summary
+
+    Returns:
+        np.ndarray
+    """
+    return '<b>Team: ' + agg_team['Team'].values + \
+           '</b><br>Apperances with reported spirit: ' + agg_team['count'].astype(str).values + \
+           '<br>Average spirit score: ' + np.round(agg_team['avg_spirit'], decimals=2).astype(str).values + \
+           '<br>Average placement: ' + np.round(agg_team['avg_rank'], decimals=2).astype(str).values
+
+
+def spirit_layout(agg_team: pd.DataFrame) -> dict:
+    """ Get spirit scatter plot layout
+
+    Args:
+        agg_team (pd.DataFrame): output of team_summary
+
+    Returns:
+        dict
+    """
+    high_tick = int(np.floor(min(agg_team['avg_rank'])))
+    low_tick = int(np.ceil(max(agg_team['avg_rank']))+1)
+    tickvals = list(reversed(range(high_tick, low_tick)))
+    ticktext = [ordinal(n) for n in tickvals]
+    layout = {
+        'paper_bgcolor': BACKGROUND_COLOR_LIGHT,
+        'plot_bgcolor': PLOT_BACKGROUND_COLOR,
+        'showlegend': False,
+        'height': 550,
+        'margin': {'t': 0},
+        'font': {'size': TICK_SIZE, 'family': 'Arial'},
+        'xaxis': {'title': {'text': 'Average Spirit Score', 'font': {'size': AXIS_TITLE_SIZE}},
+                  'fixedrange': True},
+        'yaxis': {'autorange': 'reversed', 'zeroline': False, 'fixedrange': True,
+                  'title': {'text': 'Average Nationals Placement', 'font': {'size': AXIS_TITLE_SIZE}},
+                  'tickmode': 'array', 'tickvals': tickvals, 'ticktext': ticktext,
+                  }
+    }
+    return layout
+
+
+@memoize(QUERY_CACHE)
+@METRICS.timed_stage('figure')
 def spirit_correlation(comp_division: str, division: str, region: str = 'all', highlight_teams: list = None) -> dict:
     """ Prepare spirit scatter plot
 
@@ -229,9 +607,7 @@ def spirit_correlation(comp_division: str, division: str, region: str = 'all', h
     if highlight_teams is None:
         highlight_teams = div_df.Team.tolist()
 
-    agg_team = div_df.groupby('Team').agg(count=('year', 'count'),
-                                avg_spirit=('SpiritScores', np.nanmean),
-                                avg_rank=('Standing', np.nanmean)).reset_index()
+    agg_team = team_summary(comp_division, division, region)
     if highlight_teams:
         df = agg_team[agg_team['Team'].isin(highlight_teams)]
         df = df[pd.notna(df.avg_spirit)]
@@ -242,16 +618,7 @@ def spirit_correlation(comp_division: str, division: str, region: str = 'all', h
                                      marker_color=BACKGROUND_COLOR_DARK,
                                      hoverlabel={'font': {'color': 'white'}},
                                      hoverinfo='text',
-                                     hovertext='<b>Team: ' + df['Team'].values +
-                                               '</b><br>Apperances with reported spirit: ' + df['count'].astype(
-                                         str).values +
-                                               '<br>Average spirit score: ' + np.round(df['avg_spirit'],
-                                                                                            decimals=2).astype(
-                                         str).values +
-                                               '<br>Average placement: ' + np.round(df['avg_rank'],
-                                                                                         decimals=2).astype(
-                                         str).values
-                                     ,
+                                     hovertext=spirit_hovertext(df),
                                      mode='markers')]
     if any(~div_df['Team'].isin(highlight_teams)):
         df_clear = agg_team[~agg_team['Team'].isin(highlight_teams)]
@@ -267,22 +634,236 @@ def spirit_correlation(comp_division: str, division: str, region: str = 'all', h
     if not plot_data:
         return get_blank_plot('No Spirit data found')
 
-    high_tick = int(np.floor(min(agg_team['avg_rank'])))
-    low_tick = int(np.ceil(max(agg_team['avg_rank']))+1)
-    tickvals = list(reversed(range(high_tick, low_tick)))
-    ticktext = [ordinal(n) for n in tickvals]
-    layout = {
-        'paper_bgcolor': BACKGROUND_COLOR_LIGHT,
-        'plot_bgcolor': PLOT_BACKGROUND_COLOR,
-        'showlegend': False,
-        'height': 550,
-        'margin': {'t': 0},
-        'font': {'size': TICK_SIZE, 'family': 'Arial'},
-        'xaxis': {'title': {'text': 'Average Spirit Score', 'font': {'size': AXIS_TITLE_SIZE}},
-                  'fixedrange': True},
-        'yaxis': {'autorange': 'reversed', 'zeroline': False, 'fixedrange': True,
-                  'title': {'text': 'Average Nationals Placement', 'font': {'size': AXIS_TITLE_SIZE}},
-                  'tickmode': 'array', 'tickvals': tickvals, 'ticktext': ticktext,
-                  }
-    }
+    layout = spirit_layout(agg_team)
     return dict(data=plot_data, layout=layout)
+
+
+@memoize(QUERY_CACHE)
+@METRICS.timed_stage('figure')
+def highlight_data(comp_division: str, division: str, region: str = 'all') -> dict:
+    """ Get everything the browser needs to redraw the ranking and spirit plots for any highlighted teams
+
+    The figures are rebuilt client side (assets/highlight.js) the same way as
+    ranking_data(..., compact=True) and spirit_correlation.
+
+    Args:
+        comp_division (str): competitive division name
+        division (str): gendered sub division name
+        region (str): region name
+
+    Returns:
+        dict
+    """
+    div_df = decode_teams(subset_df(comp_division, division, region))
+    if div_df.empty:
+        blank = get_blank_plot('No data found')
+        return {'ranking_blank': blank, 'spirit_blank': blank}
+
+    # placements over the full year range per team, teams ordered by first year and placement
+    years = list(range(div_df.year.min(), div_df.year.max() + 1))
+    teams = div_df.sort_values(['year', 'Standing'], kind='mergesort')['Team'].unique()
+    standings = div_df.pivot(index='year', columns='Team', values='Standing').reindex(index=years, columns=teams)
+
+    # teams with same place/year in order, for hover info
+    overlap = div_df.drop_duplicates(['year', 'Standing', 'Team'])
+    overlap_teams = overlap.groupby([overlap['year'].astype(str) + '-' + overlap['Standing'].astype(str)],
+                                    sort=False)['Team'].agg(list)
+
+    agg_team = team_summary(comp_division, division, region)
+    spirit_teams = agg_team[pd.notna(agg_team.avg_spirit)]
+
+    return {'ranking_blank': None,
+            'ranking_layout': ranking_layout(div_df),
+            'years': years,
+            'teams': teams.tolist(),
+            'standings': [[None if pd.isna(v) else int(v) for v in standings[t]] for t in teams],
+            'overlap_teams': overlap_teams.to_dict(),
+            'webgl_min_teams': WEBGL_MIN_TEAMS,
+            'spirit_blank': get_blank_plot('No Spirit data found') if spirit_teams.empty else None,
+            'spirit_layout': spirit_layout(agg_team),
+            'spirit_teams': spirit_teams['Team'].tolist(),
+            'spirit_x': spirit_teams['avg_spirit'].tolist(),
+            'spirit_y': spirit_teams['avg_rank'].tolist(),
+            'spirit_count': spirit_teams['count'].tolist(),
+            'spirit_hovertext': spirit_hovertext(spirit_teams).tolist(),
+            'marker_color': BACKGROUND_COLOR_DARK}
+
+
+def iter_filters():
+    """ Iterate over every filter combination
+
+    Yields:
+        (comp_division, division, region)
+    """
+    for comp_division in COMP_DIVISIONS:
+        for division in get_divisions(comp_division):
+            for region in get_regions(comp_division, division['value']):
+                yield comp_division, division['value'], region['value']
+
+
+def filter_view(comp_division: str, division: str, region: str = 'all') -> tuple:
+    """ Get summary table records and graph data for filters, from the prebuilt views when available
+
+    Args:
+        comp_division (str): competitive division name
+        division (str): gendered sub division name
+        region (str): region name
+
+    Returns:
+        tuple: (table records, highlight data)
+    """
+    view = VIEWS.get((comp_division, division, region))
+    if view is None:
+        return table_records(comp_division, division, region), highlight_data(comp_division, division, region)
+    return view['table'], view['highlight']
+
+
+def views_builder_version() -> str:
+    """ Get a hash of the code building the views, views built by other code or library versions are not used
+
+    Returns:
+        str
+    """
+    digest = hashlib.sha1(f'pandas {pd.__version__} plotly {plotly.__version__}'.encode())
+    for module_path in (__file__, dash_constants.__file__):
+        with open(module_path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def write_views(path: str = VIEWS_PATH):
+    """ Build the table and graph data of every filter combination and save it tagged with the dataset and builder
+    versions
+
+    Args:
+        path (str): views json path
+    """
+    views = [{'comp_division': comp_division, 'division': division, 'region': region,
+              'table': table_records(comp_division, division, region),
+              'highlight': highlight_data(comp_division, division, region)}
+             for comp_division, division, region in iter_filters()]
+    with atomic_path(path) as tmp_path, open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': DATA_VERSION, 'builder': views_builder_version(), 'views': views}, f,
+                  cls=PlotlyJSONEncoder)
+
+
+def load_views(path: str = VIEWS_PATH) -> dict:
+    """ Load prebuilt views if they were built from the loaded dataset by the current code
+
+    Args:
+        path (str): views json path
+
+    Returns:
+        dict: (comp_division, division, region) -> view
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        views = json.load(f)
+    if views['version'] != DATA_VERSION:
+        print(f'{path} was built from another dataset version, computing views live')
+        return {}
+    if views.get('builder') != views_builder_version():
+        print(f'{path} was built by other code, computing views live')
+        return {}
+    return {(v['comp_division'], v['division'], v['region']): v for v in views['views']}
+
+
+def warm_query_cache() -> int:
+    """ Compute the table and graph data of every filter combination missing from the prebuilt views
+
+    Run once before forking workers so they all start with a warm cache.
+
+    Returns:
+        int: number of filter combinations
+    """
+    stage_start = time.perf_counter()
+    num_views = 0
+    for filters in iter_filters():
+        filter_view(*filters)
+        num_views += 1
+    STARTUP_TIMES['warm query cache'] = time.perf_counter() - stage_start
+    return num_views
+
+
+def set_dataset(df: pd.DataFrame, dynasties: dict = None):
+    """ Replace the dataset behind every query, e.g. to benchmark the queries on another dataset
+
+    Prebuilt views are dropped and the query cache switches to the new dataset version.
+
+    Args:
+        df (pd.DataFrame): all results, string columns are made categorical
+        dynasties (dict): dynasty metrics of df if already computed, see build_dynasties
+    """
+    global data, DATABASE, DATA_VERSION, COMP_DIVISIONS, SUBSETS, EMPTY_SUBSET, VIEWS, DYNASTIES
+    df = compact_dataset(df)
+    data = df
+    DATABASE = None
+    DATA_VERSION = dataset_version(df)
+    COMP_DIVISIONS = df.comp_division.unique()
+    SUBSETS = build_subset_index(df)
+    EMPTY_SUBSET = df.iloc[0:0]
+    VIEWS = {}
+    QUERY_CACHE.set_version(DATA_VERSION)
+    DYNASTIES = build_dynasties() if dynasties is None else dynasties
+
+
+def set_database(database: SqliteDataset):
+    """ Query the SQLite copy of a dataset instead of an in memory dataset
+
+    Prebuilt views are dropped and the query cache switches to the database's dataset version.
+
+    Args:
+        database (SqliteDataset): SQLite dataset
+    """
+    global data, DATABASE, DATA_VERSION, COMP_DIVISIONS, SUBSETS, EMPTY_SUBSET, VIEWS, DYNASTIES
+    data = None
+    DATABASE = database
+    DATA_VERSION = database.version
+    COMP_DIVISIONS = database.comp_divisions()
+    SUBSETS = {}
+    EMPTY_SUBSET = None
+    VIEWS = {}
+    QUERY_CACHE.set_version(DATA_VERSION)
+    DYNASTIES = build_dynasties()
+
+
+_stage_start = time.perf_counter()
+VIEWS = load_views()
+STARTUP_TIMES['load views'] = time.perf_counter() - _stage_start
+
+_stage_start = time.perf_counter()
+# dynasty metrics of every division, updated in place when a season is appended
+DYNASTIES = build_dynasties()
+STARTUP_TIMES['dynasty metrics'] = time.perf_counter() - _stage_start
+
+
+def append_season(season_df: pd.DataFrame):
+    """ Add the results of a new nationals to the in memory dataset
+
+    Dynasty metrics of divisions which already had an earlier nationals are updated with the new season only, the
+    other divisions are computed from their results. Library entry point only, the app reads the scraped dataset at
+    start and is restarted after a scrape.
+
+    Args:
+        season_df (pd.DataFrame): results of one year's nationals, any competitive divisions
+    """
+    if data is None:
+        raise ValueError('seasons can only be appended to the in memory dataset, the SQLite copy is rebuilt by the '
+                         'scrape')
+    dynasties = dict(DYNASTIES)
+    set_dataset(pd.concat([data.astype(DATA_DTYPES), season_df.astype(DATA_DTYPES)], ignore_index=True),
+                dynasties=dynasties)
+    year = int(season_df['year'].max())
+    for (comp_division, division), div_df in season_df.groupby(['comp_division', 'division'], sort=False):
+        metrics = dynasties.get((comp_division, division))
+        if metrics is not None and metrics.years and year > metrics.years[-1]:
+            metrics.append_season(year, div_df)
+        else:
+            dynasties[(comp_division, division)] = DynastyMetrics.from_results(subset_df(comp_division, division,
+                                                                                         'all'))
+
+
+if __name__ == '__main__':
+    # rebuild the views for the current dataset
+    write_views()